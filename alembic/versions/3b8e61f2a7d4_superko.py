@@ -0,0 +1,29 @@
+"""superko
+
+Revision ID: 3b8e61f2a7d4
+Revises: d7b1e4a09c36
+Create Date: 2016-07-24 15:12:48.391502
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3b8e61f2a7d4'
+down_revision = 'd7b1e4a09c36'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('automatch', sa.Column('superko', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('challenges', sa.Column('superko', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('challenges') as batch_op:
+        batch_op.drop_column('superko')
+
+    with op.batch_alter_table('automatch') as batch_op:
+        batch_op.drop_column('superko')
@@ -0,0 +1,336 @@
+"""binary board data
+
+Revision ID: 5e2c8a91d4b7
+Revises: baadf574c940
+Create Date: 2016-07-16 10:12:44.318203
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5e2c8a91d4b7'
+down_revision = 'baadf574c940'
+branch_labels = None
+depends_on = None
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+games = sa.table('games', sa.column('id', sa.Integer), sa.column('board', sa.Binary))
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    # Existing JSON rows are kept as bytes and then encoded.
+    with op.batch_alter_table('games') as batch_op:
+        batch_op.alter_column('board', type_=sa.Binary(), existing_nullable=False,
+                              postgresql_using="convert_to(board, 'UTF8')")
+
+    _convert(lambda data: _encode(_compact(json.loads(data.decode())), 1) if data[:1] == b'{' else data)
+
+
+def downgrade():
+    _convert(lambda data: json.dumps(_decode(data)[0]).encode() if data[:1] != b'{' else data)
+
+    with op.batch_alter_table('games') as batch_op:
+        batch_op.alter_column('board', type_=sa.Text(), existing_nullable=False,
+                              postgresql_using="convert_from(board, 'UTF8')")
+
+
+def _convert(func):
+    """Rewrites the board of every game in batches, so that not all boards have to be loaded at once."""
+    conn = op.get_bind()
+    last_id = 0
+
+    while True:
+        rows = conn.execute(sa.select([games.c.id, games.c.board])
+                            .where(games.c.id > last_id)
+                            .order_by(games.c.id)
+                            .limit(BATCH_SIZE)).fetchall()
+
+        if not rows:
+            break
+
+        for game_id, data in rows:
+            data = data.encode() if isinstance(data, str) else bytes(data)
+            conn.execute(games.update().where(games.c.id == game_id).values(board=func(data)))
+
+        last_id = rows[-1][0]
+
+
+# The binary encoding of boards as of this revision. It is copied here instead of using `weiqi.encoding`, so that the
+# migration keeps writing the same data when the encoding changes. Boards are converted between the stored JSON and the
+# binary encoding without creating `Board` objects.
+
+
+def _compact(board):
+    """Converts dead stones and score points of older JSON rows to bitsets."""
+    for node in board['tree']:
+        marked_dead = node.get('marked_dead')
+        if isinstance(marked_dead, dict):
+            node['marked_dead'] = sum(1 << int(c) for c, dead in marked_dead.items() if dead)
+
+        score_points = node.get('score_points')
+        if score_points and isinstance(score_points[0], str):
+            node['score_points'] = [sum(1 << c for c, owner in enumerate(score_points) if owner == color)
+                                    for color in ('x', 'o')]
+
+    return board
+
+
+ACTIONS = (None, 'B', 'W', 'E')
+COLORS = ('.', 'x', 'o')
+SYMBOLS = ('TR', 'SQ', 'CR')
+
+ACTION_MASK = 0x03
+HAS_CAPTURES = 0x04
+HAS_EDITS = 0x08
+HAS_MARKED_DEAD = 0x10
+HAS_SCORE_POINTS = 0x20
+HAS_MARKUP = 0x40
+HAS_CHILDREN = 0x80
+
+
+def _encode(board, version):
+    """Encodes a board given as dict, with dead stones and score points as bitsets."""
+    out = bytearray([version])
+    varint = _varint_writer(out)
+    tree = board['tree']
+    current_node_id = board['current_node_id']
+
+    varint(board['size'])
+    varint(board.get('handicap', 0))
+    varint(1 if board.get('superko') else 0)
+    varint(current_node_id + 1 if current_node_id is not None else 0)
+
+    if version == 2:
+        varint(COLORS.index(_current(board)))
+
+    varint(len(tree))
+
+    implicit_children = [[] for _ in tree]
+    for node in tree:
+        if node.get('parent_id') is not None:
+            implicit_children[node['parent_id']].append(node['id'])
+
+    for node in tree:
+        _write_node(out, varint, node, (node.get('children') or []) != implicit_children[node['id']])
+
+    return bytes(out)
+
+
+def _write_node(out, varint, node, explicit_children):
+    flags = ACTIONS.index(node.get('action'))
+    flags |= HAS_CAPTURES if node.get('captures') else 0
+    flags |= HAS_EDITS if node.get('edits') else 0
+    flags |= HAS_MARKED_DEAD if node.get('marked_dead') else 0
+    flags |= HAS_SCORE_POINTS if node.get('score_points') else 0
+    flags |= HAS_MARKUP if node.get('labels') or node.get('symbols') else 0
+    flags |= HAS_CHILDREN if explicit_children else 0
+
+    out.append(flags)
+    varint(node['id'] - node['parent_id'] if node.get('parent_id') is not None else 0)
+    varint(node['move'] + 3 if node.get('move') is not None else 0)
+
+    if flags & HAS_CAPTURES:
+        varint(len(node['captures']))
+        for coord in node['captures']:
+            varint(coord)
+
+    if flags & HAS_EDITS:
+        varint(len(node['edits']))
+        for coord, color in node['edits'].items():
+            varint(int(coord)*4 + COLORS.index(color))
+
+    if flags & HAS_MARKED_DEAD:
+        _write_bitset(varint, out, node['marked_dead'])
+
+    if flags & HAS_SCORE_POINTS:
+        _write_bitset(varint, out, node['score_points'][0])
+        _write_bitset(varint, out, node['score_points'][1])
+
+    if flags & HAS_MARKUP:
+        labels = node.get('labels') or {}
+        varint(len(labels))
+        for coord, label in labels.items():
+            label = label.encode()
+            varint(int(coord))
+            varint(len(label))
+            out += label
+
+        symbols = node.get('symbols') or {}
+        varint(len(symbols))
+        for coord, symbol in symbols.items():
+            varint(int(coord)*4 + SYMBOLS.index(symbol))
+
+    if flags & HAS_CHILDREN:
+        varint(len(node['children']))
+        for child in node['children']:
+            varint(child)
+
+
+def _decode(data):
+    """Decodes a board to a dict, with dead stones and score points as bitsets. Returns it and the encoding version."""
+    version = data[0]
+
+    if version not in (1, 2):
+        raise ValueError('unknown board encoding version: {}'.format(version))
+
+    size, pos = _read_varint(data, 1)
+    handicap, pos = _read_varint(data, pos)
+    superko, pos = _read_varint(data, pos)
+    current_node_id, pos = _read_varint(data, pos)
+
+    # The current color of version 2 follows from the nodes.
+    if version == 2:
+        _, pos = _read_varint(data, pos)
+
+    count, pos = _read_varint(data, pos)
+
+    board = {
+        'size': size,
+        'handicap': handicap,
+        'superko': bool(superko),
+        'current_node_id': current_node_id - 1 if current_node_id else None,
+        'tree': [],
+    }
+
+    _read_nodes(board['tree'], data, pos, count)
+    board['current'] = _current(board)
+
+    return board, version
+
+
+def _read_nodes(tree, data, pos, count):
+    """Appends `count` nodes read from `data` at `pos` to the tree and returns the position after them."""
+    explicit_children = {}
+
+    for _ in range(count):
+        node_id = len(tree)
+        flags = data[pos]
+        parent, pos = _read_varint(data, pos + 1)
+        move, pos = _read_varint(data, pos)
+
+        node = {
+            'id': node_id,
+            'parent_id': node_id - parent if parent else None,
+            'children': [],
+            'action': ACTIONS[flags & ACTION_MASK],
+            'move': move - 3 if move else None,
+        }
+
+        if node['parent_id'] is not None:
+            tree[node['parent_id']]['children'].append(node_id)
+
+        if flags & HAS_CAPTURES:
+            count, pos = _read_varint(data, pos)
+            node['captures'], pos = _read_varints(data, pos, count)
+
+        if flags & HAS_EDITS:
+            count, pos = _read_varint(data, pos)
+            edits, pos = _read_varints(data, pos, count)
+            node['edits'] = {str(e >> 2): COLORS[e & 3] for e in edits}
+
+        if flags & HAS_MARKED_DEAD:
+            node['marked_dead'], pos = _read_bitset(data, pos)
+
+        if flags & HAS_SCORE_POINTS:
+            black, pos = _read_bitset(data, pos)
+            white, pos = _read_bitset(data, pos)
+            node['score_points'] = [black, white]
+
+        if flags & HAS_MARKUP:
+            labels = {}
+            count, pos = _read_varint(data, pos)
+
+            for _ in range(count):
+                coord, pos = _read_varint(data, pos)
+                length, pos = _read_varint(data, pos)
+                labels[str(coord)] = data[pos:pos+length].decode()
+                pos += length
+
+            count, pos = _read_varint(data, pos)
+            symbols, pos = _read_varints(data, pos, count)
+
+            if labels:
+                node['labels'] = labels
+            if symbols:
+                node['symbols'] = {str(s >> 2): SYMBOLS[s & 3] for s in symbols}
+
+        if flags & HAS_CHILDREN:
+            count, pos = _read_varint(data, pos)
+            explicit_children[node_id], pos = _read_varints(data, pos, count)
+
+        tree.append(node)
+
+    for node_id, children in explicit_children.items():
+        tree[node_id]['children'] = children
+
+    return pos
+
+
+def _current(board):
+    """Returns the color to move after the current node, edit nodes keep the color of their parent."""
+    node_id = board['current_node_id']
+
+    while node_id is not None:
+        node = board['tree'][node_id]
+
+        if node['action'] == 'B':
+            return 'o'
+        if node['action'] == 'W':
+            return 'x'
+        if node['parent_id'] is None:
+            return 'o'
+
+        node_id = node['parent_id']
+
+    return 'x'
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+
+        if byte < 0x80:
+            return result, pos
+
+        shift += 7
+
+
+def _read_varints(data, pos, count):
+    values = []
+
+    for _ in range(count):
+        value, pos = _read_varint(data, pos)
+        values.append(value)
+
+    return values, pos
+
+
+def _read_bitset(data, pos):
+    length, pos = _read_varint(data, pos)
+    return int.from_bytes(data[pos:pos+length], 'little'), pos + length
+
+
+def _varint_writer(out):
+    def varint(value):
+        while value >= 0x80:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+
+        out.append(value)
+
+    return varint
+
+
+def _write_bitset(varint, out, bits):
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    varint(len(data))
+    out += data
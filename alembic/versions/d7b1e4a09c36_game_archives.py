@@ -0,0 +1,50 @@
+"""game archives
+
+Revision ID: d7b1e4a09c36
+Revises: 9a4f3c7e2b15
+Create Date: 2016-07-21 21:40:12.806127
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd7b1e4a09c36'
+down_revision = '9a4f3c7e2b15'
+branch_labels = None
+depends_on = None
+
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('game_archives',
+                    sa.Column('game_id', sa.Integer(), nullable=False),
+                    sa.Column('archived_at', sa.DateTime(), nullable=True),
+                    sa.Column('data', sa.Binary(), nullable=False),
+                    sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+                    sa.PrimaryKeyConstraint('game_id'))
+
+    with op.batch_alter_table('games') as batch_op:
+        batch_op.alter_column('board', existing_type=sa.Binary(), nullable=True)
+        batch_op.create_check_constraint('board_check', "board IS NOT NULL OR stage = 'finished'")
+
+
+def downgrade():
+    # Archived boards are moved back into the games table before it requires a board again.
+    conn = op.get_bind()
+    games = sa.table('games', sa.column('id', sa.Integer), sa.column('board', sa.Binary))
+    archives = sa.table('game_archives', sa.column('game_id', sa.Integer), sa.column('data', sa.Binary))
+
+    for game_id, data in conn.execute(sa.select([archives.c.game_id, archives.c.data])).fetchall():
+        conn.execute(games.update().where(games.c.id == game_id).values(board=zlib.decompress(data)))
+
+    # SQLite does not reflect the constraint, the table is recreated without it by the batch operation instead.
+    if conn.dialect.name != 'sqlite':
+        op.drop_constraint('board_check', 'games', type_='check')
+
+    with op.batch_alter_table('games') as batch_op:
+        batch_op.alter_column('board', existing_type=sa.Binary(), nullable=False)
+
+    op.drop_table('game_archives')
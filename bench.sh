@@ -0,0 +1,16 @@
+#!/bin/bash
+# Runs the benchmarks in weiqi/test/benchmarks.
+#
+#   ./bench.sh save    Stores the results as new baseline in .benchmarks/
+#   ./bench.sh         Compares the results with the last baseline and fails if the fastest round of a benchmark
+#                      got slower by more than $BENCHMARK_TOLERANCE (default 10%).
+#
+# Further arguments are passed to py.test, e.g. `./bench.sh -k board`.
+
+if [ "$1" == "save" ]; then
+    shift
+    exec py.test weiqi/test/benchmarks --benchmark-only --benchmark-save=baseline "$@"
+fi
+
+exec py.test weiqi/test/benchmarks --benchmark-only --benchmark-compare \
+    --benchmark-compare-fail=min:${BENCHMARK_TOLERANCE:-10%} "$@"
@@ -16,6 +16,7 @@
 
 import logging
 import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 import tornado.httpserver
@@ -28,8 +29,12 @@ from weiqi.handler import auth, socket, index, metrics
 from weiqi.handler.socket import SocketMixin
 from weiqi.message.broker import create_message_broker
 from weiqi.message.pubsub import PubSub
+from weiqi.position_index import compact_indexes
 from weiqi.services import GameService, PlayService
 
+# Runs service callbacks which take too long to run on the IOLoop.
+_background_executor = ThreadPoolExecutor(1)
+
 
 class Application(tornado.web.Application):
     def __init__(self):
@@ -51,6 +56,7 @@ class Application(tornado.web.Application):
 
             handler(r'/api/users/(.*?)/avatar', index.AvatarHandler),
             handler(r'/api/games/(.*?)/sgf', index.SgfHandler),
+            handler(r'/api/games/(.*?)/positions/(.*?)', index.PositionHandler),
 
             handler(r'/api/metrics', metrics.MetricsHandler),
 
@@ -78,6 +84,9 @@ def run_app():
     spawn_cb(service_callback_runner(app, GameService, 'check_due_moves', timedelta(seconds=1)))
     spawn_cb(service_callback_runner(app, PlayService, 'cleanup_challenges', timedelta(seconds=1)))
     spawn_cb(service_callback_runner(app, PlayService, 'cleanup_automatches', timedelta(seconds=10)))
+    spawn_cb(service_callback_runner(app, GameService, 'archive_games', settings.ARCHIVE_GAMES_INTERVAL,
+                                     _background_executor))
+    spawn_cb(background_callback_runner(compact_indexes, settings.POSITION_INDEX_COMPACT_INTERVAL))
 
     tornado.ioloop.IOLoop.current().start()
 
@@ -86,19 +95,40 @@ def create_app():
     return Application()
 
 
-def service_callback_runner(app, service, method, interval):
-    """Returns a coroutine which periodically runs a method on the given service."""
+def service_callback_runner(app, service, method, interval, executor=None):
+    """Returns a coroutine which periodically runs a method on the given service.
+
+    The method runs on the IOLoop, or on the given executor if it would block the IOLoop for too long.
+    """
+    def run():
+        with session() as db:
+            socket = SocketMixin()
+            socket.initialize(app.pubsub)
+            svc = service(db, socket)
+            getattr(svc, method)()
+
     @gen.coroutine
     def callback():
         # Sleep for a random duration so that different processes don't all run at the same time.
         yield gen.sleep(random.random())
 
         while True:
-            with session() as db:
-                socket = SocketMixin()
-                socket.initialize(app.pubsub)
-                svc = service(db, socket)
-                getattr(svc, method)()
+            if executor:
+                yield executor.submit(run)
+            else:
+                run()
+
+            yield gen.sleep(interval.total_seconds())
+    return callback
 
+
+def background_callback_runner(func, interval):
+    """Returns a coroutine which periodically runs a function returning a `Future` and waits for it."""
+    @gen.coroutine
+    def callback():
+        yield gen.sleep(random.random())
+
+        while True:
+            yield func()
             yield gen.sleep(interval.total_seconds())
     return callback
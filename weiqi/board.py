@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import random
 import re
+from collections import OrderedDict
 
 EMPTY = '.'
 BLACK = 'x'
@@ -31,6 +33,11 @@ SYMBOL_TRIANGLE = 'TR'
 SYMBOL_SQUARE = 'SQ'
 SYMBOL_CIRCLE = 'CR'
 
+# Board positions are stored as a bytearray of these color codes.
+CODE_EMPTY = ord(EMPTY)
+CODE_BLACK = ord(BLACK)
+CODE_WHITE = ord(WHITE)
+
 
 def coord2d(x, y, size=9):
     return (y-1)*size + (x-1)
@@ -60,7 +67,24 @@ def coord_to_sgf(coord, size):
     return chr(ord('a')+x-1) + chr(ord('a')+y-1)
 
 
-def neighbors(coord, size):
+_neighbor_tables = {}
+
+
+def neighbor_table(size):
+    """Returns a tuple which contains the neighbors of every coordinate on a board of the given size.
+
+    Tables are only computed once per board size.
+    """
+    table = _neighbor_tables.get(size)
+
+    if table is None:
+        table = tuple(_compute_neighbors(coord, size) for coord in range(size*size))
+        _neighbor_tables[size] = table
+
+    return table
+
+
+def _compute_neighbors(coord, size):
     x, y = coord_to_2d(coord, size)
     x -= 1
     y -= 1
@@ -75,7 +99,109 @@ def neighbors(coord, size):
     if x < size-1:
         n.append(coord + 1)
 
-    return n
+    return tuple(n)
+
+
+for _size in (9, 13, 19):
+    neighbor_table(_size)
+
+
+def neighbors(coord, size):
+    return neighbor_table(size)[coord]
+
+
+def coords_to_bits(coords) -> int:
+    """Returns a bitset in which the bits of the given coordinates are set."""
+    bits = 0
+    for coord in coords:
+        bits |= 1 << coord
+    return bits
+
+
+def bits_to_coords(bits) -> list:
+    """Returns the coordinates of all set bits in ascending order."""
+    coords = []
+
+    while bits:
+        low = bits & -bits
+        coords.append(low.bit_length() - 1)
+        bits ^= low
+
+    return coords
+
+
+def points_to_bits(points) -> tuple:
+    """Converts a list with the owner of every point to a tuple `(black, white)` of bitsets."""
+    black = coords_to_bits(c for c, owner in enumerate(points) if owner == BLACK)
+    white = coords_to_bits(c for c, owner in enumerate(points) if owner == WHITE)
+    return black, white
+
+
+def points_from_bits(bits, length) -> list:
+    """Converts a tuple `(black, white)` of bitsets to a list with the owner of every point."""
+    points = [EMPTY] * length
+    black, white = bits
+
+    for c in bits_to_coords(black):
+        points[c] = BLACK
+    for c in bits_to_coords(white):
+        points[c] = WHITE
+
+    return points
+
+
+def flood_fill(pos, size, origin, through, stop=()):
+    """Returns all points which can be reached from `origin` by only passing points whose code is in `through`.
+
+    The result is a tuple `(region, border)` of the reached points and the points adjacent to them which could not be
+    passed. Returns None as soon as a point whose code is in `stop` is adjacent to the region.
+    """
+    table = neighbor_table(size)
+    visited = bytearray(size*size)
+    visited[origin] = 1
+    region = {origin}
+    border = set()
+    stack = [origin]
+
+    while stack:
+        for n in table[stack.pop()]:
+            if visited[n]:
+                continue
+
+            visited[n] = 1
+            code = pos[n]
+
+            if code in through:
+                region.add(n)
+                stack.append(n)
+            elif code in stop:
+                return None
+            else:
+                border.add(n)
+
+    return region, border
+
+
+_zobrist_tables = {}
+
+
+def zobrist_table(size):
+    """Returns the Zobrist keys for a board of the given size.
+
+    The result maps `CODE_BLACK` and `CODE_WHITE` to a tuple with a random 64-bit key for every coordinate.
+    Keys are generated from a fixed seed so that position hashes are stable across processes.
+    """
+    table = _zobrist_tables.get(size)
+
+    if table is None:
+        rnd = random.Random(size)
+        table = {
+            CODE_BLACK: tuple(rnd.getrandbits(64) for _ in range(size*size)),
+            CODE_WHITE: tuple(rnd.getrandbits(64) for _ in range(size*size)),
+        }
+        _zobrist_tables[size] = table
+
+    return table
 
 
 def opposite(color):
@@ -89,37 +215,119 @@ def validate_move(move, size):
         raise ValueError('invalid move: {}'.format(move))
 
 
+class _LazyContainer:
+    """Node attribute whose container is only created on first access.
+
+    Most nodes leave most of their containers empty, so they are kept as None in the underlying slot until used.
+    """
+
+    def __init__(self, slot, factory):
+        self.slot = slot
+        self.factory = factory
+
+    def __get__(self, node, owner):
+        if node is None:
+            return self
+
+        val = getattr(node, self.slot)
+        if val is None:
+            val = self.factory()
+            setattr(node, self.slot, val)
+
+        return val
+
+    def __set__(self, node, val):
+        setattr(node, self.slot, val)
+
+
 class Node:
+    __slots__ = ('id', 'parent_id', 'action', 'move', 'marked_dead', 'score_points', 'current', 'pos_hash', 'owner',
+                 '_children', '_edits', '_captures', '_labels', '_symbols')
+
+    FIELDS = ('id', 'parent_id', 'children', 'action', 'move', 'edits', 'captures', 'marked_dead', 'score_points',
+              'labels', 'symbols')
+
+    children = _LazyContainer('_children', list)
+    edits = _LazyContainer('_edits', dict)  # Used for action NODE_EDIT
+    captures = _LazyContainer('_captures', list)  # Only set for actions NODE_BLACK and NODE_WHITE
+    labels = _LazyContainer('_labels', dict)
+    symbols = _LazyContainer('_symbols', dict)
+
     def __init__(self):
         self.id = None
         self.parent_id = None
-        self.children = []
 
         self.action = None
         self.move = None  # Used for actions NODE_BLACK and NODE_WHITE
-        self.edits = {}  # Used for action NODE_EDIT
 
-        self.captures = []  # Only set for actions NODE_BLACK and NODE_WHITE
-        self.marked_dead = {}
-        self.score_points = []
-        self.labels = {}
-        self.symbols = {}
+        # Bitset of the stones marked as dead.
+        self.marked_dead = 0
 
-    def to_dict(self):
+        # Tuple `(black, white)` of bitsets with the points owned by each color, or None if the node was not scored.
+        self.score_points = None
+
+        self._children = None
+        self._edits = None
+        self._captures = None
+        self._labels = None
+        self._symbols = None
+
+        # Color to move after this node. Only kept in memory and set when the node is added to a board.
+        self.current = None
+
+        # Zobrist hash of the position after this node. Only kept in memory and filled in when the position is built.
+        self.pos_hash = None
+
+        # Token of the board which may modify this node in place, see `Board.fork`. Only kept in memory.
+        self.owner = None
+
+    def copy(self):
+        """Returns a copy of this node with its own containers."""
+        node = Node()
+
+        for attr in ['id', 'parent_id', 'action', 'move', 'marked_dead', 'score_points', 'current', 'pos_hash']:
+            setattr(node, attr, getattr(self, attr))
+
+        for attr in ['_children', '_edits', '_captures', '_labels', '_symbols']:
+            val = getattr(self, attr)
+            if val is not None:
+                setattr(node, attr, val.copy())
+
+        return node
+
+    def to_dict(self, length=None, compact=False):
+        """Returns the node data.
+
+        If `compact` is set dead stones and score points are kept as bitsets, which is the form used for storage.
+        Otherwise they are converted to a dict of dead coordinates and a list with the owner of every point, which
+        requires the `length` of the board.
+        """
         data = {
             'id': self.id,
             'parent_id': self.parent_id,
-            'children': self.children,
+            'children': self._children or [],
             'action': self.action,
             'move': self.move,
         }
 
-        skip_empty = ['edits', 'captures', 'marked_dead', 'score_points', 'labels', 'symbols']
+        skip_empty = ['edits', 'captures', 'labels', 'symbols']
         for field in skip_empty:
-            val = getattr(self, field)
+            val = getattr(self, '_' + field)
             if val:
                 data[field] = val
 
+        if self.marked_dead:
+            if compact:
+                data['marked_dead'] = self.marked_dead
+            else:
+                data['marked_dead'] = {str(c): True for c in bits_to_coords(self.marked_dead)}
+
+        if self.score_points:
+            if compact:
+                data['score_points'] = list(self.score_points)
+            else:
+                data['score_points'] = points_from_bits(self.score_points, length)
+
         return data
 
     def toggle_symbol(self, coord, symbol):
@@ -170,35 +378,103 @@ class IllegalMoveError(Exception):
     pass
 
 
+class Chain:
+    """A group of connected stones of the same color together with its liberties."""
+    __slots__ = ['color', 'stones', 'liberties']
+
+    def __init__(self, color, stones, liberties):
+        self.color = color
+        self.stones = stones
+        self.liberties = liberties
+
+
 class Board:
-    def __init__(self, size=9, handicap=0):
+    # Every this many plies the position after the node is stored as checkpoint, so that rebuilding a position never
+    # needs to replay more than this number of nodes.
+    CHECKPOINT_INTERVAL = 32
+
+    # Upper limit for the number of checkpoints held per board, the oldest ones are discarded first.
+    MAX_CHECKPOINTS = 64
+
+    def __init__(self, size=9, handicap=0, superko=False):
         self.size = size
         self.handicap = handicap
+        self.superko = superko
         self.tree = []
         self.current_node_id = None
-        self._pos = [EMPTY]*size*size
+        self._pos = bytearray([CODE_EMPTY])*size*size
         self._pos_node_id = None
+        self._pos_depth = -1
+        self._hash = 0
+        # Checkpoints as `node_id: (depth, position, hash)`, oldest first. They are kept by the board rather than on
+        # the nodes, since nodes may be shared with forks.
+        self._checkpoints = OrderedDict()
+        self._chains = None
+        self._history = None
+        self._history_node_id = None
+        self._neighbors = neighbor_table(size)
+        self._zobrist = zobrist_table(size)
+        self._owner = object()
 
         if self.handicap > 0:
             self.place_handicap(self.handicap)
 
-    def __str__(self):
-        board = ''
+    def fork(self) -> 'Board':
+        """Returns a copy of this board which shares all nodes with it.
+
+        Shared nodes are copied by whichever board modifies them first, see `writable_node`. The fork starts with a copy
+        of the checkpoints.
+        """
+        board = Board(self.size)
+        board.handicap = self.handicap
+        board.superko = self.superko
+        board.tree = list(self.tree)
+        board.current_node_id = self.current_node_id
 
-        for i, c in enumerate(self.pos):
-            board += c
+        board._pos = bytearray(self._pos)
+        board._pos_node_id = self._pos_node_id
+        board._pos_depth = self._pos_depth
+        board._hash = self._hash
+        board._checkpoints = OrderedDict(self._checkpoints)
 
-            if (i+1) % self.size == 0:
-                board += '\n'
+        if self._history is not None:
+            board._history = set(self._history)
+            board._history_node_id = self._history_node_id
+
+        # Neither board owns the existing nodes anymore.
+        self._owner = object()
 
         return board
 
-    def to_dict(self):
+    def writable_node(self, node_id=None) -> Node:
+        """Returns the node with the given id, or the current node, for modification.
+
+        If the node is shared with another board it is replaced by a copy first.
+        """
+        if node_id is None:
+            node_id = self.current_node_id
+
+        node = self.tree[node_id]
+
+        if node.owner is not self._owner:
+            node = node.copy()
+            node.owner = self._owner
+            self.tree[node_id] = node
+
+        return node
+
+    def __str__(self):
+        pos = self.pos_array.decode()
+        return ''.join(pos[i:i+self.size] + '\n' for i in range(0, self.length, self.size))
+
+    def to_dict(self, compact=False):
+        """Returns the board data, see `Node.to_dict` for `compact`."""
         return {
             'size': self.size,
             'handicap': self.handicap,
+            'superko': self.superko,
             'current': self.current,
-            'tree': [n.to_dict() for n in self.tree],
+            'tree': [n.to_dict(self.length, compact) for n in self.tree],
             'current_node_id': self.current_node_id,
         }
 
@@ -208,12 +484,31 @@ class Board:
 
     @property
     def pos(self):
+        """Returns the current position as a list of colors."""
+        return list(self.pos_array.decode())
+
+    @property
+    def pos_array(self):
+        """Returns the current position as a bytearray of color codes.
+
+        This is the internal representation of the position and must not be modified.
+        """
         if self._pos_node_id != self.current_node_id:
-            self._rebuild_pos()
+            self._sync_pos()
         return self._pos
 
+    @property
+    def position_hash(self):
+        """Returns the Zobrist hash of the current position.
+
+        Positions with the same stones have the same hash, which makes it usable as a cache key.
+        """
+        if self._pos_node_id != self.current_node_id:
+            self._sync_pos()
+        return self._hash
+
     def at(self, coord):
-        return self.pos[coord]
+        return chr(self.pos_array[coord])
 
     @property
     def current_node(self) -> Node:
@@ -226,17 +521,7 @@ class Board:
         if not node:
             return BLACK
 
-        while node:
-            if node.action == NODE_BLACK:
-                return WHITE
-            elif node.action == NODE_WHITE:
-                return BLACK
-
-            if node.parent_id is None:
-                # Handicap game
-                return WHITE
-
-            node = self.tree[node.parent_id]
+        return node.current
 
     @current.setter
     def current(self, color):
@@ -249,7 +534,7 @@ class Board:
         if not self.current_node:
             return None
 
-        if len(self.current_node.captures) == 1:
+        if self.current_node._captures and len(self.current_node._captures) == 1:
             return self.current_node.captures[0]
         return None
 
@@ -271,19 +556,28 @@ class Board:
         validate_move(move, self.size)
 
         if move in [PASS, RESIGN]:
+            synced = self._pos_node_id == self.current_node_id
             self._add_move(move)
+
+            if synced:
+                self._synced_to_current()
             return
 
         caps = self._find_captures(move)
 
         self._validate_legal(move, caps)
 
+        chains = self._chain_map()
         for c in caps:
-            self.pos[c] = EMPTY
+            if chains[c] is not None:
+                self._remove_chain(chains[c])
 
-        self.pos[move] = self.current
+        self._place_stone(move, ord(self.current))
         self._add_move(move, caps)
 
+        # The position was updated in place, there is no need to rebuild it for the new node.
+        self._synced_to_current()
+
     def _validate_legal(self, coord, captures):
         """Checks if the given move is valid for the current player.
 
@@ -299,6 +593,63 @@ class Board:
         if self.is_suicide(coord, self.current):
             raise IllegalMoveError('coordinate is a suicide')
 
+        if self.superko and self._hash_after(coord, captures) in self._superko_history():
+            raise IllegalMoveError('move repeats a previous position')
+
+    def _hash_after(self, coord, captures, color=None):
+        """Returns the position hash after the given player plays on `coord` and captures the given stones."""
+        color = ord(color or self.current)
+        other = CODE_WHITE if color == CODE_BLACK else CODE_BLACK
+        h = self.position_hash ^ self._zobrist[color][coord]
+
+        for c in captures:
+            h ^= self._zobrist[other][c]
+
+        return h
+
+    def _superko_history(self) -> set:
+        """Returns the hashes of all positions from the root up to the current node."""
+        if self._history_node_id != self.current_node_id or self._history is None:
+            self._history = {node.pos_hash for node in self._node_path(self.current_node_id)}
+
+            if None in self._history:
+                self._rebuild_pos(from_root=True)
+                self._history = {node.pos_hash for node in self._node_path(self.current_node_id)}
+
+            self._history_node_id = self.current_node_id
+
+        return self._history
+
+    def legal_moves(self, color=None) -> bytearray:
+        """Returns a bytearray which is 1 for every point the given player may play on and 0 otherwise.
+
+        Uses the same rules as `play`. The ko rule only applies to the current player.
+        """
+        if not color:
+            color = self.current
+
+        pos = self.pos_array
+        ko = self.ko if color == self.current else None
+        history = self._superko_history() if self.superko else None
+        legal = bytearray(self.length)
+
+        for coord in range(self.length):
+            if pos[coord] != CODE_EMPTY or self.is_suicide(coord, color):
+                continue
+
+            if coord == ko or history is not None:
+                caps = self._find_captures(coord, color)
+
+                if coord == ko and len(caps) == 1:
+                    continue
+
+                if history is not None and self._hash_after(coord, caps, color) in history:
+                    continue
+
+            legal[coord] = 1
+
+        return legal
+
     def is_suicide(self, coord, color=None):
         """Checks if the given move is a suicide for the current player.
         A move is not suicide if any of the following conditions holds true:
@@ -309,19 +660,21 @@ class Board:
         if not color:
             color = self.current
 
-        for n in neighbors(coord, self.size):
-            n_color = self.at(n)
+        color = ord(color)
+        chains = self._chain_map()
+
+        for n in self._neighbors[coord]:
+            chain = chains[n]
 
-            if n_color == EMPTY:
+            if chain is None:
                 return False
 
-            chain = self.chain_at(n)
-            libs = len(self.chain_liberties(chain))
+            libs = len(chain.liberties)
 
-            if n_color == color and libs > 1:
+            if chain.color == color and libs > 1:
                 return False
 
-            if n_color != color and libs == 1:
+            if chain.color != color and libs == 1:
                 return False
 
         return True
@@ -330,73 +683,149 @@ class Board:
         if not color:
             color = self.current
 
+        color = ord(color)
+        chains = self._chain_map()
         caps = set()
 
-        for n in neighbors(coord, self.size):
-            if self.at(n) == EMPTY or self.at(n) == color:
-                continue
+        for n in self._neighbors[coord]:
+            chain = chains[n]
 
-            chain = self.chain_at(n)
-            if len(self.chain_liberties(chain)) <= 1:
-                caps |= chain
+            if chain is not None and chain.color != color and len(chain.liberties) <= 1:
+                caps |= chain.stones
 
         return caps
 
     def chain_at(self, coord) -> set:
-        chain = set()
-        color = self.at(coord)
-
-        if color == EMPTY:
-            return chain
-
-        def populate(c):
-            for n in neighbors(c, self.size):
-                if self.at(n) == color and n not in chain:
-                    chain.add(n)
-                    populate(n)
-
-        chain.add(coord)
-        populate(coord)
-        return chain
+        chain = self._chain_map()[coord]
+        return set(chain.stones) if chain else set()
 
     def loose_chain_at(self, coord) -> set:
         """Returns all stones loosely connected to the given coordinate.
 
         A stone is loosely connected if it is either connected directly or can be reached by only passing empty spaces.
         """
-        chain = set()
-        visited = set()
-        color = self.at(coord)
-
-        if color == EMPTY:
-            return chain
-
-        def populate(c):
-            for n in neighbors(c, self.size):
-                if n in visited:
-                    continue
-
-                visited.add(n)
+        pos = self.pos_array
+        color = pos[coord]
 
-                if self.at(n) == color:
-                    chain.add(n)
+        if color == CODE_EMPTY:
+            return set()
 
-                if self.at(n) in [color, EMPTY]:
-                    populate(n)
-
-        populate(coord)
-        return chain
+        region, _ = flood_fill(pos, self.size, coord, (color, CODE_EMPTY))
+        return {c for c in region if pos[c] == color}
 
     def chain_liberties(self, chain) -> set:
         libs = set()
+        pos = self.pos_array
 
         for c in chain:
-            for n in neighbors(c, self.size):
-                if self.at(n) == EMPTY:
+            for n in self._neighbors[c]:
+                if pos[n] == CODE_EMPTY:
                     libs.add(n)
 
         return libs
 
+    def _chain_map(self):
+        """Returns a list which maps every coordinate to the `Chain` occupying it, or None for empty points.
+
+        The chains are built once for a position and then kept up to date by `play`, so that capture, ko and suicide
+        checks only need to look at the chains next to a move.
+        """
+        pos = self.pos_array
+
+        if self._chains is None:
+            self._chains = [None]*self.length
+
+            for coord in range(self.length):
+                if pos[coord] != CODE_EMPTY and self._chains[coord] is None:
+                    self._build_chain(coord)
+
+        return self._chains
+
+    def _build_chain(self, coord):
+        pos = self._pos
+        color = pos[coord]
+        stones, border = flood_fill(pos, self.size, coord, (color,))
+        chain = Chain(color, stones, {c for c in border if pos[c] == CODE_EMPTY})
+
+        for c in stones:
+            self._chains[c] = chain
+
+    def _place_stone(self, coord, color):
+        """Places a stone and merges it with its neighboring chains.
+
+        Captured stones need to be removed beforehand.
+        """
+        chains = self._chains
+        chain = Chain(color, {coord}, set())
+        merge = []
+
+        for n in self._neighbors[coord]:
+            n_chain = chains[n]
+
+            if n_chain is None:
+                chain.liberties.add(n)
+            elif n_chain.color != color:
+                n_chain.liberties.discard(coord)
+            elif n_chain not in merge:
+                merge.append(n_chain)
+
+        if merge:
+            # Merge everything into the largest chain so that the fewest stones need to be reassigned.
+            merge.sort(key=lambda c: len(c.stones), reverse=True)
+            base = merge[0]
+
+            for other in merge[1:]:
+                base.stones |= other.stones
+                base.liberties |= other.liberties
+                for c in other.stones:
+                    chains[c] = base
+
+            base.stones.add(coord)
+            base.liberties |= chain.liberties
+            base.liberties.discard(coord)
+            chain = base
+
+        chains[coord] = chain
+        self._set_point(coord, color)
+
+    def _remove_chain(self, chain):
+        chains = self._chains
+
+        for c in chain.stones:
+            self._set_point(c, CODE_EMPTY)
+            chains[c] = None
+
+        for c in chain.stones:
+            for n in self._neighbors[c]:
+                if chains[n] is not None:
+                    chains[n].liberties.add(c)
+
+    def _set_point(self, coord, code):
+        """Changes a single point of the position and updates the position hash accordingly."""
+        old = self._pos[coord]
+
+        if old != CODE_EMPTY:
+            self._hash ^= self._zobrist[old][coord]
+        if code != CODE_EMPTY:
+            self._hash ^= self._zobrist[code][coord]
+
+        self._pos[coord] = code
+
+    def _synced_to_current(self):
+        """Marks the position as belonging to the current node, after it was updated in place."""
+        node = self.current_node
+        node.pos_hash = self._hash
+
+        if self._history is not None and self._history_node_id == node.parent_id:
+            self._history.add(node.pos_hash)
+            self._history_node_id = node.id
+
+        self._pos_node_id = node.id
+        self._pos_depth += 1
+
+        if self._pos_depth % self.CHECKPOINT_INTERVAL == 0:
+            self._add_checkpoint(node)
+
     def _add_move(self, move, caps=None):
         node = Node()
         node.action = NODE_BLACK if self.current == BLACK else NODE_WHITE
@@ -414,43 +843,166 @@ class Board:
         node.edits.update({str(c): WHITE for c in white})
         node.edits.update({str(c): EMPTY for c in empty})
 
+        synced = self._pos_node_id == self.current_node_id
         self._add_node(node)
 
+        if synced:
+            self._apply_node(node)
+            self._synced_to_current()
+
     def _add_node(self, node):
         node.id = len(self.tree)
+        node.owner = self._owner
 
         if self.current_node_id is not None:
             node.parent_id = self.current_node_id
-            self.tree[node.parent_id].children.append(node.id)
+            self.writable_node(node.parent_id).children.append(node.id)
 
         self.tree.append(node)
         self.current_node_id = node.id
+        self._set_node_current(node)
+
+    def _set_node_current(self, node):
+        """Sets the color to move after the given node, which is inherited by edit nodes."""
+        if node.action == NODE_BLACK:
+            node.current = WHITE
+        elif node.action == NODE_WHITE:
+            node.current = BLACK
+        elif node.parent_id is None:
+            # Handicap game
+            node.current = WHITE
+        else:
+            node.current = self.tree[node.parent_id].current
 
-    def _rebuild_pos(self):
-        """Rebuilds the current position based on the tree data."""
-        if self.current_node_id is None:
-            return
+    def _sync_pos(self):
+        """Updates the position after the current node changed.
 
-        path = self._node_path(self.current_node_id)
-        self._pos = [EMPTY]*self.length
+        Nearby nodes are reached by undoing moves up to the lowest common ancestor of the old and the new node and then
+        replaying the moves down to the new node. Otherwise the position is rebuilt from the tree.
+        """
+        if not self._navigate(self._pos_node_id, self.current_node_id):
+            self._rebuild_pos()
 
-        for node in path:
-            if node.action == NODE_BLACK and node.move not in [PASS, RESIGN]:
-                self._pos[node.move] = BLACK
-            elif node.action == NODE_WHITE and node.move not in [PASS, RESIGN]:
-                self._pos[node.move] = WHITE
-            elif node.action == NODE_EDIT:
-                for coord, color in node.edits.items():
-                    self._pos[int(coord)] = color
+    def _navigate(self, from_id, to_id):
+        """Moves the position from node `from_id` to node `to_id`.
 
-            for c in node.captures:
-                self._pos[c] = EMPTY
+        Returns False without changing anything if the nodes are further apart than `CHECKPOINT_INTERVAL` plies on
+        either side of their common ancestor, or if an edit node would need to be undone.
+        """
+        # `None` stands for the empty board, which acts as a virtual parent of all root nodes.
+        up, down = [from_id], [to_id]
+        up_index, down_index = {from_id: 0}, {to_id: 0}
+
+        while True:
+            if up[-1] in down_index:
+                down = down[:down_index[up[-1]]]
+                up.pop()
+                break
+
+            if down[-1] in up_index:
+                up = up[:up_index[down[-1]]]
+                down.pop()
+                break
+
+            if len(up) > self.CHECKPOINT_INTERVAL or len(down) > self.CHECKPOINT_INTERVAL:
+                return False
+
+            for ids, index in [(up, up_index), (down, down_index)]:
+                if ids[-1] is not None:
+                    node = self.tree[ids[-1]]
+                    index[node.parent_id] = len(ids)
+                    ids.append(node.parent_id)
+
+        undo = [self.tree[node_id] for node_id in up]
+
+        if any(node.action == NODE_EDIT for node in undo):
+            return False
+
+        for node in undo:
+            self._undo_node(node)
+
+        for node_id in reversed(down):
+            node = self.tree[node_id]
+            self._apply_node(node)
+            node.pos_hash = self._hash
+            self._pos_depth += 1
+
+            if self._pos_depth % self.CHECKPOINT_INTERVAL == 0:
+                self._add_checkpoint(node)
+
+        self._pos_node_id = to_id
+        return True
+
+    def _undo_node(self, node):
+        """Reverts the changes of a move node, restoring the stones it captured."""
+        if node.move not in [PASS, RESIGN]:
+            self._set_point(node.move, CODE_EMPTY)
+
+        captured = CODE_WHITE if node.action == NODE_BLACK else CODE_BLACK
+        for c in node._captures or ():
+            self._set_point(c, captured)
+
+        self._chains = None
+        self._pos_depth -= 1
+
+    def _rebuild_pos(self, from_root=False):
+        """Rebuilds the current position based on the tree data.
 
+        Replaying starts at the nearest ancestor with a checkpoint, unless `from_root` is set.
+        """
         self._pos_node_id = self.current_node_id
+        self._chains = None
+
+        path = []
+        node = self.current_node
+
+        while node is not None and (from_root or node.id not in self._checkpoints):
+            path.append(node)
+            node = self.tree[node.parent_id] if node.parent_id is not None else None
+
+        if node is None:
+            self._pos = bytearray([CODE_EMPTY])*self.length
+            self._pos_depth = -1
+            self._hash = 0
+        else:
+            self._pos_depth, pos, self._hash = self._checkpoints[node.id]
+            self._pos = bytearray(pos)
+
+        for node in reversed(path):
+            self._apply_node(node)
+            node.pos_hash = self._hash
+            self._pos_depth += 1
+
+            if self._pos_depth % self.CHECKPOINT_INTERVAL == 0:
+                self._add_checkpoint(node)
+
+    def _add_checkpoint(self, node):
+        if self._pos_depth == 0 or node.id in self._checkpoints:
+            return
+
+        self._checkpoints[node.id] = (self._pos_depth, bytes(self._pos), self._hash)
+
+        if len(self._checkpoints) > self.MAX_CHECKPOINTS:
+            self._checkpoints.popitem(last=False)
+
+    def _apply_node(self, node):
+        """Applies the changes of the given node to the position."""
+        self._chains = None
+
+        if node.action == NODE_BLACK and node.move not in [PASS, RESIGN]:
+            self._set_point(node.move, CODE_BLACK)
+        elif node.action == NODE_WHITE and node.move not in [PASS, RESIGN]:
+            self._set_point(node.move, CODE_WHITE)
+        elif node.action == NODE_EDIT:
+            for coord, color in node.edits.items():
+                self._set_point(int(coord), ord(color))
+
+        for c in node._captures or ():
+            self._set_point(c, CODE_EMPTY)
 
     def _node_path(self, node_id):
         path = []
-        node = self.tree[node_id]
+        node = self.tree[node_id] if node_id is not None else None
 
         while node:
             path.append(node)
@@ -460,29 +1012,33 @@ class Board:
         return path
 
     def is_marked_dead(self, coord):
-        if not self.current_node or not self.current_node.marked_dead:
+        if not self.current_node:
             return False
 
-        return self.current_node.marked_dead.get(str(coord), False)
+        return bool(self.current_node.marked_dead >> coord & 1)
 
     def mark_dead(self, coord):
         if self.at(coord) == EMPTY or not self.current_node:
             return
 
-        for c in self.loose_chain_at(coord):
-            self.current_node.marked_dead[str(c)] = True
+        node = self.writable_node()
+        node.marked_dead |= coords_to_bits(self.loose_chain_at(coord))
 
-    def toggle_marked_dead(self, coord):
+    def toggle_marked_dead(self, coord) -> set:
+        """Toggles the dead mark of the loosely connected stones at the given coordinate and returns them."""
         if self.at(coord) == EMPTY or not self.current_node:
-            return
+            return set()
 
-        marked_dead = self.current_node.marked_dead.get(str(coord), False)
+        node = self.writable_node()
+        chain = self.loose_chain_at(coord)
+        bits = coords_to_bits(chain)
 
-        for c in self.loose_chain_at(coord):
-            if marked_dead:
-                self.current_node.marked_dead.pop(str(c), None)
-            else:
-                self.current_node.marked_dead[str(c)] = True
+        if self.is_marked_dead(coord):
+            node.marked_dead &= ~bits
+        else:
+            node.marked_dead |= bits
+
+        return chain
 
     def place_handicap(self, hc):
         if hc < 2:
@@ -501,28 +1057,29 @@ class Board:
         if not self.current_node or self.current_node.action != NODE_EDIT:
             self.add_edits([], [], [])
 
-        node = self.current_node
+        node = self.writable_node()
 
         if self.at(coord) == color:
             node.edits[str(coord)] = EMPTY
         else:
             # Setting to EMPTY is necessary to find the correct captures
             node.edits[str(coord)] = EMPTY
-            self._pos[coord] = EMPTY
+            self._pos[coord] = CODE_EMPTY
+            self._chains = None
 
             for c in self._find_captures(coord, color):
                 node.edits[str(c)] = EMPTY
 
             node.edits[str(coord)] = color
 
-        self._rebuild_pos()
+        self._edits_changed(node)
 
     def edit_cycle(self, coord):
         """Cycles through BLACK, WHITE, EMPTY as edits on the given coordinate."""
         if not self.current_node or self.current_node.action != NODE_EDIT:
             self.add_edits([], [], [])
 
-        node = self.current_node
+        node = self.writable_node()
         current_color = self.at(coord)
 
         if current_color == BLACK:
@@ -535,13 +1092,29 @@ class Board:
         if new_color != EMPTY:
             # Setting to EMPTY is necessary to find the correct captures
             node.edits[str(coord)] = EMPTY
-            self._pos[coord] = EMPTY
+            self._pos[coord] = CODE_EMPTY
+            self._chains = None
 
             for c in self._find_captures(coord, new_color):
                 node.edits[str(c)] = EMPTY
 
         node.edits[str(coord)] = new_color
 
+        self._edits_changed(node)
+
+    def _edits_changed(self, node):
+        """Discards cached position data of the given node and all of its descendants after its edits changed."""
+        stack = [node.id]
+
+        while stack:
+            # The positions of all descendants change, so they can't be shared with another board anymore.
+            n = self.writable_node(stack.pop())
+            n.pos_hash = None
+            self._checkpoints.pop(n.id, None)
+
+            stack.extend(n.children)
+
+        self._history = None
         self._rebuild_pos()
 
 
@@ -564,14 +1137,37 @@ def board_from_string(pos, size=9) -> Board:
 def board_from_dict(data) -> Board:
     board = Board(data['size'])
     board.handicap = data.get('handicap', 0)
+    board.superko = data.get('superko', False)
     board.current_node_id = data['current_node_id']
     board.tree = [node_from_dict(n) for n in data['tree']]
+
+    # Parents are always added before their children.
+    for node in board.tree:
+        node.owner = board._owner
+        board._set_node_current(node)
+
     return board
 
 
 def node_from_dict(data) -> Node:
     node = Node()
-    node.__dict__.update(data)
+
+    for field in Node.FIELDS:
+        if field in data:
+            setattr(node, field, data[field])
+
+    # Dead stones and score points are stored as bitsets, but older data and the frontend use dicts and lists.
+    if isinstance(node.marked_dead, dict):
+        node.marked_dead = coords_to_bits(int(c) for c, dead in node.marked_dead.items() if dead)
+
+    if node.score_points:
+        if isinstance(node.score_points[0], str):
+            node.score_points = points_to_bits(node.score_points)
+        else:
+            node.score_points = tuple(node.score_points)
+    else:
+        node.score_points = None
+
     return node
 
 
@@ -0,0 +1,92 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""JSON encoding for socket messages, pubsub messages and stored data.
+
+The fastest available of `orjson` and `rapidjson` is used, otherwise the standard library. Every backend produces
+compact output without escaping non-ASCII characters, and encodes datetimes with `isoformat` and objects which have
+a `to_dict` method as the dict it returns. Any other type raises a `TypeError`.
+"""
+
+import json
+from datetime import datetime
+
+
+def _default(o):
+    if isinstance(o, datetime):
+        return o.isoformat()
+
+    if hasattr(o, 'to_dict'):
+        return o.to_dict()
+
+    raise TypeError('{!r} is not JSON serializable'.format(o))
+
+
+def _stdlib():
+    encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_default)
+    decoder = json.JSONDecoder()
+
+    def loads(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode()
+        return decoder.decode(data)
+
+    return encoder.encode, loads
+
+
+def _orjson():
+    import orjson
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=options).decode()
+
+    return dumps, orjson.loads
+
+
+def _rapidjson():
+    import rapidjson
+
+    def dumps(obj):
+        return rapidjson.dumps(obj, default=_default, ensure_ascii=False,
+                               mapping_mode=rapidjson.MM_COERCE_KEYS_TO_STRINGS)
+
+    def loads(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode()
+        return rapidjson.loads(data)
+
+    return dumps, loads
+
+
+CODECS = [('orjson', _orjson), ('rapidjson', _rapidjson), ('json', _stdlib)]
+
+
+def available_codecs():
+    """Returns the names and `(dumps, loads)` functions of all codecs which can be imported, fastest first."""
+    codecs = []
+
+    for name, codec in CODECS:
+        try:
+            codecs.append((name, codec()))
+        except ImportError:
+            pass
+
+    return codecs
+
+
+NAME, (dumps, loads) = available_codecs()[0]
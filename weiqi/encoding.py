@@ -0,0 +1,409 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Binary encoding of boards for storage.
+
+An encoded board starts with the format version followed by the header `size, handicap, superko, current_node_id + 1,
+current color, number of nodes`. Version 1 did not store the current color. Every node then starts with a flags byte,
+the distance to its parent id (0 for the root) and its move plus 3 (0 if it has none). The flags tell which of the
+following optional fields are present:
+
+- captures: count and coordinates
+- edits: count and `coord*4 + color` for each
+- marked dead stones: bitset
+- score points: bitsets of black and white points
+- labels and symbols: count and `coord, label` or `coord*4 + symbol` for each
+- children: count and ids, only if they are not simply all nodes with this parent in order of their ids
+
+All numbers are unsigned varints, bitsets are stored as their length in bytes followed by the bytes in little endian
+order. Node ids are the index in the tree.
+
+A single node appended to a board is encoded by `encode_node` as the format version followed by the node.
+
+Boards of archived games are stored compressed with zlib, see `compress_board`.
+
+Decoding reads only the header, the nodes are read once the board's tree is first accessed, see `LazyBoard`.
+"""
+
+import zlib
+
+from weiqi import codec
+from weiqi.board import (Board, Node, NODE_BLACK, NODE_WHITE, NODE_EDIT, EMPTY, BLACK, WHITE, SYMBOL_TRIANGLE,
+                         SYMBOL_SQUARE, SYMBOL_CIRCLE, board_from_dict)
+
+VERSION = 2
+
+_ACTIONS = (None, NODE_BLACK, NODE_WHITE, NODE_EDIT)
+_COLORS = (EMPTY, BLACK, WHITE)
+_SYMBOLS = (SYMBOL_TRIANGLE, SYMBOL_SQUARE, SYMBOL_CIRCLE)
+
+_ACTION_MASK = 0x03
+_HAS_CAPTURES = 0x04
+_HAS_EDITS = 0x08
+_HAS_MARKED_DEAD = 0x10
+_HAS_SCORE_POINTS = 0x20
+_HAS_MARKUP = 0x40
+_HAS_CHILDREN = 0x80
+
+
+def encode_board(board) -> bytes:
+    out = bytearray([VERSION])
+    varint = _varint_writer(out)
+
+    varint(board.size)
+    varint(board.handicap)
+    varint(1 if board.superko else 0)
+    varint(board.current_node_id + 1 if board.current_node_id is not None else 0)
+    varint(_COLORS.index(board.current))
+    varint(len(board.tree))
+
+    children = _implicit_children(board.tree)
+
+    for node in board.tree:
+        _write_node(out, varint, node, (node._children or []) != children[node.id])
+
+    return bytes(out)
+
+
+def decode_board(data) -> Board:
+    """Decodes a board from `encode_board`, or from JSON for rows which were stored before the binary encoding."""
+    if isinstance(data, str):
+        return board_from_dict(codec.loads(data))
+
+    data = bytes(data)
+
+    if data[:1] == b'{':
+        return board_from_dict(codec.loads(data))
+
+    if data[0] not in (1, VERSION):
+        raise ValueError('unknown board encoding version: {}'.format(data[0]))
+
+    size, pos = _read_varint(data, 1)
+    handicap, pos = _read_varint(data, pos)
+    superko, pos = _read_varint(data, pos)
+    current_node_id, pos = _read_varint(data, pos)
+    current_node_id = current_node_id - 1 if current_node_id else None
+
+    if data[0] == 1:
+        count, pos = _read_varint(data, pos)
+        board = Board(size)
+        board.current_node_id = current_node_id
+        _read_nodes(board, data, pos, count)
+    else:
+        current, pos = _read_varint(data, pos)
+        count, pos = _read_varint(data, pos)
+        board = LazyBoard(size, data, pos, count, current_node_id, _COLORS[current])
+
+    board.handicap = handicap
+    board.superko = bool(superko)
+
+    return board
+
+
+class LazyBoard(Board):
+    """A decoded board which reads its nodes only once the tree is first accessed.
+
+    The number of nodes and the current color are known from the header, so that `moves_played` and `current` do not
+    need the tree. Nodes added with `append_node` are kept encoded as well until the tree is read.
+    """
+
+    def __init__(self, size, data, pos, count, current_node_id, current):
+        super().__init__(size)
+        del self.tree
+        self.current_node_id = current_node_id
+        self._data = data
+        self._nodes_pos = pos
+        self._node_count = count
+        self._appended = []
+        self._header_current = (current_node_id, current)
+
+    def __getattr__(self, name):
+        # Only called while the tree was not read yet, afterwards it is a regular attribute.
+        if name != 'tree':
+            raise AttributeError(name)
+
+        self.tree = []
+        _read_nodes(self, self._data, self._nodes_pos, self._node_count)
+
+        for data in self._appended:
+            _read_nodes(self, data, 1, 1)
+
+        self._data = self._appended = None
+        return self.tree
+
+    @property
+    def is_loaded(self):
+        return self._data is None
+
+    @property
+    def current(self):
+        node_id, current = self._header_current
+
+        if self.is_loaded or self.current_node_id != node_id:
+            return super().current
+
+        return current
+
+    @current.setter
+    def current(self, color):
+        Board.current.fset(self, color)
+
+    @property
+    def moves_played(self):
+        if self.is_loaded:
+            return len(self.tree)
+
+        return self._node_count + len(self._appended)
+
+    def _append_encoded(self, data):
+        """Keeps an encoded node from `append_node` for when the tree is read.
+
+        Returns False if the current color after the node can not be told without reading the tree.
+        """
+        node_id = self.moves_played
+        parent, pos = _read_varint(data, 2)
+        action = _ACTIONS[data[1] & _ACTION_MASK]
+
+        if action == NODE_BLACK:
+            current = WHITE
+        elif action == NODE_WHITE:
+            current = BLACK
+        elif not parent:
+            current = WHITE
+        elif node_id - parent == self.current_node_id:
+            current = self.current
+        else:
+            return False
+
+        self._appended.append(data)
+        self.current_node_id = node_id
+        self._header_current = (node_id, current)
+        return True
+
+
+def compress_board(board) -> bytes:
+    return zlib.compress(encode_board(board), 9)
+
+
+def decompress_board(data) -> Board:
+    return decode_board(zlib.decompress(data))
+
+
+def encode_node(node) -> bytes:
+    """Encodes a single node which was added to a board, for `append_node`.
+
+    The node's children are not stored, they are restored from the parents of nodes appended later.
+    """
+    out = bytearray([VERSION])
+    _write_node(out, _varint_writer(out), node, False)
+    return bytes(out)
+
+
+def append_node(board, data):
+    """Adds a node from `encode_node` to the board and makes it the current node."""
+    data = bytes(data)
+
+    if data[0] not in (1, VERSION):
+        raise ValueError('unknown board encoding version: {}'.format(data[0]))
+
+    if isinstance(board, LazyBoard) and not board.is_loaded and board._append_encoded(data):
+        return
+
+    _read_nodes(board, data, 1, 1)
+    board.current_node_id = len(board.tree) - 1
+
+
+def _write_node(out, varint, node, explicit_children):
+    flags = _ACTIONS.index(node.action)
+    flags |= _HAS_CAPTURES if node._captures else 0
+    flags |= _HAS_EDITS if node._edits else 0
+    flags |= _HAS_MARKED_DEAD if node.marked_dead else 0
+    flags |= _HAS_SCORE_POINTS if node.score_points else 0
+    flags |= _HAS_MARKUP if node._labels or node._symbols else 0
+    flags |= _HAS_CHILDREN if explicit_children else 0
+
+    out.append(flags)
+    varint(node.id - node.parent_id if node.parent_id is not None else 0)
+    varint(node.move + 3 if node.move is not None else 0)
+
+    if flags & _HAS_CAPTURES:
+        varint(len(node.captures))
+        for coord in node.captures:
+            varint(coord)
+
+    if flags & _HAS_EDITS:
+        varint(len(node.edits))
+        for coord, color in node.edits.items():
+            varint(int(coord)*4 + _COLORS.index(color))
+
+    if flags & _HAS_MARKED_DEAD:
+        _write_bitset(varint, out, node.marked_dead)
+
+    if flags & _HAS_SCORE_POINTS:
+        _write_bitset(varint, out, node.score_points[0])
+        _write_bitset(varint, out, node.score_points[1])
+
+    if flags & _HAS_MARKUP:
+        varint(len(node.labels))
+        for coord, label in node.labels.items():
+            label = label.encode()
+            varint(int(coord))
+            varint(len(label))
+            out += label
+
+        varint(len(node.symbols))
+        for coord, symbol in node.symbols.items():
+            varint(int(coord)*4 + _SYMBOLS.index(symbol))
+
+    if flags & _HAS_CHILDREN:
+        varint(len(node.children))
+        for child in node.children:
+            varint(child)
+
+
+def _read_nodes(board, data, pos, count):
+    """Appends `count` nodes read from `data` at `pos` to the board's tree and returns the position after them."""
+
+    def varint():
+        nonlocal pos
+        result = shift = 0
+
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+
+            if byte < 0x80:
+                return result
+
+            shift += 7
+
+    def bitset():
+        nonlocal pos
+        length = varint()
+        pos += length
+        return int.from_bytes(data[pos-length:pos], 'little')
+
+    tree = board.tree
+    owner = board._owner
+    explicit_children = {}
+
+    for node_id in range(len(tree), len(tree) + count):
+        node = Node()
+        node.id = node_id
+        node.owner = owner
+
+        # Parent distance and move almost always fit into a single byte each.
+        flags, parent, move = data[pos:pos+3]
+
+        if parent < 0x80 and move < 0x80:
+            pos += 3
+        else:
+            pos += 1
+            parent = varint()
+            move = varint()
+
+        node.action = _ACTIONS[flags & _ACTION_MASK]
+
+        if move:
+            node.move = move - 3
+
+        if parent:
+            node.parent_id = node_id - parent
+            siblings = tree[node.parent_id]._children
+
+            if siblings is None:
+                tree[node.parent_id]._children = [node_id]
+            else:
+                siblings.append(node_id)
+
+        if flags & _HAS_CAPTURES:
+            node._captures = [varint() for _ in range(varint())]
+
+        if flags & _HAS_EDITS:
+            edits = (varint() for _ in range(varint()))
+            node._edits = {str(e >> 2): _COLORS[e & 3] for e in edits}
+
+        if flags & _HAS_MARKED_DEAD:
+            node.marked_dead = bitset()
+
+        if flags & _HAS_SCORE_POINTS:
+            node.score_points = (bitset(), bitset())
+
+        if flags & _HAS_MARKUP:
+            labels = {}
+            for _ in range(varint()):
+                coord = varint()
+                length = varint()
+                pos += length
+                labels[str(coord)] = data[pos-length:pos].decode()
+
+            symbols = (varint() for _ in range(varint()))
+            node._labels = labels or None
+            node._symbols = {str(s >> 2): _SYMBOLS[s & 3] for s in symbols} or None
+
+        if flags & _HAS_CHILDREN:
+            explicit_children[node_id] = [varint() for _ in range(varint())]
+
+        tree.append(node)
+        board._set_node_current(node)
+
+    for node_id, children in explicit_children.items():
+        tree[node_id].children = children
+
+    return pos
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+
+        if byte < 0x80:
+            return result, pos
+
+        shift += 7
+
+
+def _implicit_children(tree):
+    """Returns the children of every node as they are restored if not stored explicitly."""
+    children = [[] for _ in tree]
+
+    for node in tree:
+        if node.parent_id is not None:
+            children[node.parent_id].append(node.id)
+
+    return children
+
+
+def _varint_writer(out):
+    def varint(value):
+        while value >= 0x80:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+
+        out.append(value)
+
+    return varint
+
+
+def _write_bitset(varint, out, bits):
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    varint(len(data))
+    out += data
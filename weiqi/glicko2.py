@@ -81,6 +81,10 @@ class Rating:
     def clone(self):
         return Rating(self.rating, self.deviation, self.volatility)
 
+    def to_dict(self):
+        """Returns the attributes of the rating, players are read back with `player_from_dict`."""
+        return dict(self.__dict__)
+
 
 class RatingEncoder(JSONEncoder):
     def default(self, o):
@@ -15,11 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from sqlalchemy.orm import undefer
+from sqlalchemy.orm.exc import NoResultFound
 from tornado.web import HTTPError
 from weiqi import settings
 from weiqi.handler.base import BaseHandler
 from weiqi.identicon import generate_identicon
 from weiqi.models import User, Game
+from weiqi.services import GameService, ServiceError
+from weiqi.services.games import NotAllowedError
 from weiqi.sgf import game_to_sgf
 
 
@@ -69,7 +72,7 @@ class AvatarHandler(BaseHandler):
 
 class SgfHandler(BaseHandler):
     def get(self, game_id):
-        game = self.db.query(Game).options(undefer('board')).get(game_id)
+        game = self.db.query(Game).options(undefer('board_data')).get(game_id)
 
         if not game:
             raise HTTPError(404)
@@ -82,3 +85,18 @@ class SgfHandler(BaseHandler):
         self.enable_cors()
 
         self.write(game_to_sgf(game))
+
+
+class PositionHandler(BaseHandler):
+    def get(self, game_id, node_id):
+        user = self.query_current_user() if self.current_user else None
+
+        try:
+            position = GameService(self.db, None, user).position(int(game_id), int(node_id))
+        except NotAllowedError:
+            raise HTTPError(403)
+        except (ValueError, NoResultFound, ServiceError):
+            raise HTTPError(404)
+
+        self.enable_cors()
+        self.write(position)
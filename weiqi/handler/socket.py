@@ -14,14 +14,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import json
 import logging
 import uuid
 
 from tornado import gen
 from tornado.ioloop import IOLoop
 from tornado.websocket import WebSocketHandler
-from weiqi import settings, metrics
+from weiqi import settings, metrics, codec
 from weiqi.db import session
 from weiqi.models import User
 from weiqi.services import ConnectionService, execute_service
@@ -44,7 +43,7 @@ class SocketMixin:
         metrics.CONNECTED_SOCKETS.inc()
 
     def on_message(self, data):
-        msg = json.loads(data)
+        msg = codec.loads(data)
         service, method = msg.get('method').split('/', 1)
 
         with metrics.REQUEST_TIME.labels(msg.get('method')).time():
@@ -81,7 +80,7 @@ class SocketMixin:
 
     def _send_data(self, data, response_to=''):
         method = data.get('method') if not response_to else 'response/' + response_to
-        data = json.dumps(data)
+        data = codec.dumps(data)
 
         metrics.SENT_MESSAGES.labels(method).observe(len(data))
 
@@ -19,6 +19,7 @@ from tornado.options import define, options
 from weiqi import settings
 from weiqi.application import run_app
 from weiqi.db import create_db, session
+from weiqi.position_index import build_position_index, build_pattern_index
 from weiqi.prepare_startup import prepare_startup
 from weiqi.services import RoomService
 
@@ -33,6 +34,10 @@ def main():
 
     if options.prepare_startup:
         prepare_startup()
+    elif options.build_position_index:
+        build_position_index()
+    elif options.build_pattern_index:
+        build_pattern_index()
     elif options.create_room:
         with session() as db:
             RoomService(db).create_default_room(options.create_room)
@@ -47,5 +52,9 @@ def define_options():
            help="Prepare for startup instead of running the application.")
     define("create_room", type=str, default=None,
            help="Create a new default chat room")
+    define("build_position_index", type=bool, default=None,
+           help="Rebuild the position index from all finished games.")
+    define("build_pattern_index", type=bool, default=None,
+           help="Rebuild the pattern index from all finished games.")
 
     define("port_offset", type=int, default=0, help="Offset to add to the port number")
@@ -14,9 +14,10 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import json
 from collections import defaultdict
 
+from weiqi import codec
+
 
 class PubSub:
     def __init__(self, broker):
@@ -26,7 +27,7 @@ class PubSub:
         self._subs = defaultdict(set)
 
     def _on_message(self, message):
-        message = json.loads(message)
+        message = codec.loads(message)
         topic = message.get('topic')
         data = message.get('data')
 
@@ -34,7 +35,7 @@ class PubSub:
             sub(topic, data)
 
     def publish(self, topic, data):
-        message = json.dumps({
+        message = codec.dumps({
             'topic': topic,
             'data': data
         })
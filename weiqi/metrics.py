@@ -22,3 +22,7 @@ SENT_MESSAGES = Summary('weiqi_sent_message_bytes', 'Size of outgoing messages',
 CONNECTED_SOCKETS = Gauge('weiqi_connected_sockets', 'Number of connected websockets')
 EXCEPTIONS = Counter('weiqi_exceptions_total', 'Number of exceptions in requests', ['method'])
 REGISTRATIONS = Counter('weiqi_registrations_total', 'Total number of registrations')
+ARCHIVED_GAMES = Counter('weiqi_archived_games_total', 'Number of games moved to compressed storage')
+ARCHIVED_BOARD_BYTES = Counter('weiqi_archived_board_bytes_total', 'Size of archived boards before compression')
+ARCHIVED_COMPRESSED_BYTES = Counter('weiqi_archived_compressed_bytes_total',
+                                    'Size of archived boards after compression')
@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import hmac
-import json
 import re
 from datetime import datetime, timedelta
 
@@ -23,11 +22,12 @@ import bcrypt
 from sqlalchemy import (Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum, TypeDecorator, Text,
                         CheckConstraint, Binary, Interval, UniqueConstraint)
 from sqlalchemy.orm import validates, relationship, deferred
-from sqlalchemy.orm.attributes import flag_modified
-from weiqi import settings
-from weiqi.board import board_from_dict, BLACK
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
+from weiqi import settings, codec
+from weiqi.board import BLACK
 from weiqi.db import Base
-from weiqi.glicko2 import player_from_dict, RatingEncoder
+from weiqi.encoding import encode_board, decode_board, encode_node, append_node, decompress_board
+from weiqi.glicko2 import player_from_dict
 from weiqi.markdown import markdown_to_html
 
 
@@ -35,10 +35,10 @@ class RatingData(TypeDecorator):
     impl = Text
 
     def process_bind_param(self, value, dialect):
-        return json.dumps(value, cls=RatingEncoder)
+        return codec.dumps(value)
 
     def process_result_value(self, value, dialect):
-        data = json.loads(value)
+        data = codec.loads(value)
         return player_from_dict(data)
 
 
@@ -311,18 +311,20 @@ class Automatch(Base):
     preset = Column(String, nullable=False)
     min_rating = Column(Float, nullable=False)
     max_rating = Column(Float, nullable=False)
+    superko = Column(Boolean, nullable=False, default=False)
 
     __table_args__ = (CheckConstraint('min_rating <= max_rating', name='rating_check'),)
 
 
 class BoardData(TypeDecorator):
-    impl = Text
+    """Stores a board with `encode_board`. Rows stored as JSON before are still read."""
+    impl = Binary
 
     def process_bind_param(self, value, dialect):
-        return json.dumps(value.to_dict())
+        return encode_board(value) if value is not None else None
 
     def process_result_value(self, value, dialect):
-        return board_from_dict(json.loads(value))
+        return decode_board(value) if value is not None else None
 
 
 class Game(Base):
@@ -346,7 +348,11 @@ class Game(Base):
     stage = Column(Enum('playing', 'counting', 'finished', name='game_stage'), nullable=False)
     title = Column(String, nullable=False, default='')
 
-    board = deferred(Column(BoardData, nullable=False))
+    # The board as last written in full, use `board` which also includes the nodes in `board_nodes`.
+    # Archived games have no `board_data`, their board is stored compressed in `archive` instead.
+    board_data = deferred(Column('board', BoardData, nullable=True))
+    board_nodes = relationship('GameNode', order_by='GameNode.node_id', cascade='all, delete-orphan')
+    archive = relationship('GameArchive', uselist=False, cascade='all, delete-orphan')
     komi = Column(Float, nullable=False)
 
     result = Column(String, nullable=False, default='')
@@ -378,14 +384,42 @@ class Game(Base):
         CheckConstraint('is_demo OR white_user_id IS NOT NULL'),
         CheckConstraint('is_demo OR black_user_id != white_user_id'),
         CheckConstraint('NOT is_demo OR demo_owner_id IS NOT NULL'),
+        CheckConstraint("board IS NOT NULL OR stage = 'finished'", name='board_check'),
     )
 
+    _merged_board = None
+    _stored_nodes = 0
+
     @validates('is_demo', 'is_correspondence')
     def validate_is_correspondence(self, key, val):
         if key == 'is_correspondence' and val and self.is_demo:
             raise ValueError('demo games cannot be correspondence games')
         return val
 
+    @property
+    def board(self):
+        board = self.board_data
+
+        if board is None and self.archive is not None:
+            board = decompress_board(self.archive.data)
+            set_committed_value(self, 'board_data', board)
+
+        if board is not None and board is not self._merged_board:
+            for node in self.board_nodes:
+                append_node(board, node.data)
+
+            self._merged_board = board
+            self._stored_nodes = board.moves_played
+
+        return board
+
+    @board.setter
+    def board(self, board):
+        self.board_data = board
+        self.board_nodes = []
+        self._merged_board = board
+        self._stored_nodes = board.moves_played
+
     @property
     def current_user(self):
         if self.is_demo:
@@ -456,9 +490,47 @@ class Game(Base):
     def apply_board_change(self):
         """Notifies sqlalchemy about a change in the `board` field.
 
-        Needs to be called after in-place changes to the field.
+        Needs to be called after in-place changes to the field. The whole board is written again and replaces the nodes
+        stored by `append_board_nodes`.
+        """
+        board = self.board
+        self.board_nodes = []
+        self._stored_nodes = board.moves_played
+        flag_modified(self, 'board_data')
+
+    def append_board_nodes(self):
+        """Stores only the nodes which were added to the `board` since it was loaded.
+
+        Used instead of `apply_board_change` for moves in running games, so that a move does not write the whole board.
+        Must not be used if existing nodes were changed, other than by adding children to them.
         """
-        flag_modified(self, 'board')
+        board = self.board
+
+        if board.moves_played == self._stored_nodes:
+            return
+
+        for node in board.tree[self._stored_nodes:]:
+            self.board_nodes.append(GameNode(node_id=node.id, data=encode_node(node)))
+
+        self._stored_nodes = board.moves_played
+
+
+class GameNode(Base):
+    """A node added to the board of a game since the game's board was last written in full."""
+    __tablename__ = 'game_nodes'
+
+    game_id = Column(ForeignKey('games.id'), primary_key=True)
+    node_id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(Binary, nullable=False)
+
+
+class GameArchive(Base):
+    """The compressed board of a finished game, see `GameService.archive_games`."""
+    __tablename__ = 'game_archives'
+
+    game_id = Column(ForeignKey('games.id'), primary_key=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    data = Column(Binary, nullable=False)
 
 
 TimingSystem = Enum('fischer', 'byoyomi', name='timing_system')
@@ -542,6 +614,7 @@ class Challenge(Base):
     komi = Column(Float, nullable=False)
     handicap = Column(Integer, nullable=False)
     owner_is_black = Column(Boolean, nullable=False)
+    superko = Column(Boolean, nullable=False, default=False)
 
     is_correspondence = Column(Boolean, nullable=False, default=False)
     timing_system = Column(TimingSystem, nullable=False)
@@ -588,6 +661,7 @@ class Challenge(Base):
             'handicap': self.handicap,
             'komi': self.komi,
             'owner_is_black': self.owner_is_black,
+            'superko': self.superko,
             'is_correspondence': self.is_correspondence,
             'timing_system': self.timing_system,
             'maintime': self.maintime.total_seconds(),
@@ -19,9 +19,7 @@ import math
 
 def paginate(query, limit, page=1):
     total_results = query.count()
-    total_pages = max(1, math.ceil(total_results / limit))
-    page = max(1, page)
-    page = min(total_pages, page)
+    page, total_pages = page_range(total_results, limit, page)
 
     return {
         'query': query.limit(limit).offset((page-1)*limit),
@@ -29,3 +27,12 @@ def paginate(query, limit, page=1):
         'total_pages': total_pages,
         'total_results': total_results
     }
+
+
+def page_range(total_results, limit, page=1):
+    """Returns the given page number limited to the valid range and the total number of pages."""
+    total_pages = max(1, math.ceil(total_results / limit))
+    page = max(1, page)
+    page = min(total_pages, page)
+
+    return page, total_pages
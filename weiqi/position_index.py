@@ -0,0 +1,487 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Indexes of the positions and local patterns of all finished games, used to find games by board content.
+
+An index consists of postings `(key, game_id, node_id)`. For the position index the key is a hash of the whole
+position, which is the same for all its rotations and reflections. The pattern index has a key for every window of the
+board anchored at a corner or side, which is also the same if the colors are swapped.
+
+Postings are kept in a file sorted by key, which is memory-mapped and searched with a binary search. Games finishing
+while the server runs are indexed on a background thread after their transaction commits and appended to a second,
+unsorted file. It is merged into the sorted file by `compact_indexes`, which the server runs periodically.
+"""
+
+import fcntl
+import logging
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import undefer
+from weiqi import settings
+from weiqi.board import CODE_EMPTY, CODE_BLACK, CODE_WHITE, zobrist_table
+from weiqi.db import Session, session
+from weiqi.models import Game
+
+POSTING = np.dtype([('key', '<u8'), ('game_id', '<u4'), ('node_id', '<u4')])
+
+# Windows of the pattern index as (rows, columns) in the orientation of the top left corner and the top side.
+# Side windows are centered on the side.
+PATTERN_WINDOWS = {
+    'corner': (7, 7),
+    'side': (5, 9),
+}
+
+# Postings are sorted in buckets by the highest bits of their key when an index is written.
+WRITE_BUCKET_BITS = 8
+WRITE_BATCH_SIZE = 1 << 20
+
+_symmetry_tables = {}
+_pattern_tables = {}
+_indexes = {}
+
+# Games are indexed and indexes compacted on a single thread, so that neither holds up services or the IOLoop.
+_executor = ThreadPoolExecutor(1)
+
+
+def position_key(pos, size) -> int:
+    """Returns the key of a position, which is the same for all eight rotations and reflections of it.
+
+    The key is the smallest of the Zobrist hashes of the eight symmetric positions. The empty board has the key 0.
+    """
+    black_table, white_table = _symmetry_table(size)
+    codes = np.frombuffer(bytes(pos), dtype=np.uint8)
+
+    keys = np.where(codes == CODE_BLACK, black_table, np.where(codes == CODE_WHITE, white_table, np.uint64(0)))
+    return int(np.bitwise_xor.reduce(keys, axis=1).min())
+
+
+def _symmetries(size):
+    """Returns the eight rotations and reflections of the board as (size, size) arrays of coordinates."""
+    grid = np.arange(size*size).reshape(size, size)
+    return [np.rot90(g, k) for g in (grid, grid.T) for k in range(4)]
+
+
+def _symmetry_table(size):
+    """Returns the Zobrist keys of black and white stones as (8, size*size) arrays, one row for every symmetry."""
+    tables = _symmetry_tables.get(size)
+
+    if tables is None:
+        perms = [sym.ravel() for sym in _symmetries(size)]
+        zobrist = zobrist_table(size)
+
+        tables = tuple(np.array(zobrist[code], dtype=np.uint64)[perms] for code in (CODE_BLACK, CODE_WHITE))
+        _symmetry_tables[size] = tables
+
+    return tables
+
+
+def pattern_keys(pos, size) -> np.ndarray:
+    """Returns the keys of all corner and side windows of a position which contain stones."""
+    codes = np.frombuffer(bytes(pos), dtype=np.uint8)
+    keys = [_window_keys(codes, *tables) for tables in _pattern_table(size).values()]
+    keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+
+    return keys[keys != 0]
+
+
+def pattern_key(kind, pattern, size) -> int:
+    """Returns the key of a pattern given as string of colors in the orientation of the top left corner or top side.
+
+    The pattern matches the windows of `pattern_keys` of the given `kind` on boards of the given size.
+    """
+    coords, black, white = _pattern_table(size)[kind]
+
+    if len(pattern) != coords.shape[2]:
+        raise ValueError('invalid pattern length')
+
+    codes = np.full(size*size, CODE_EMPTY, dtype=np.uint8)
+    codes[coords[0, 0]] = np.frombuffer(pattern.encode(), dtype=np.uint8)
+
+    return int(_window_keys(codes, coords[:1], black, white)[0])
+
+
+def _window_keys(codes, coords, black, white):
+    """Returns the key of every window.
+
+    The key is the smallest hash of the window's two orientations, with the colors as given or swapped.
+    """
+    window = codes[coords]
+    is_black = window == CODE_BLACK
+    is_white = window == CODE_WHITE
+    zero = np.uint64(0)
+
+    keys = np.bitwise_xor.reduce(np.where(is_black, black, np.where(is_white, white, zero)), axis=2)
+    swapped = np.bitwise_xor.reduce(np.where(is_black, white, np.where(is_white, black, zero)), axis=2)
+
+    return np.minimum(keys.min(axis=1), swapped.min(axis=1))
+
+
+def _pattern_table(size):
+    """Returns a dict mapping each kind of window which fits on the board to `(coords, black, white)`.
+
+    `coords` is an array of shape (windows, 2, rows*columns) with the coordinates of every window in both of its
+    orientations, starting with the top left corner or top side. `black` and `white` are the Zobrist keys of the cells.
+    """
+    tables = _pattern_tables.get(size)
+
+    if tables is None:
+        tables = {}
+
+        for kind, (rows, cols) in sorted(PATTERN_WINDOWS.items()):
+            if rows > size or cols > size:
+                continue
+
+            start = (size - cols) // 2 if kind == 'side' else 0
+            windows = {}
+
+            for sym in _symmetries(size):
+                window = sym[:rows, start:start+cols].ravel()
+                windows.setdefault(frozenset(window.tolist()), []).append(window)
+
+            rnd = random.Random('%s-%d' % (kind, size))
+            keys = np.array([[rnd.getrandbits(64) for _ in range(rows*cols)] for _ in range(2)], dtype=np.uint64)
+            coords = np.array([variants[:2] for variants in windows.values()])
+
+            tables[kind] = (coords, keys[0], keys[1])
+
+        _pattern_tables[size] = tables
+
+    return tables
+
+
+def is_indexed(game) -> bool:
+    """Returns whether the positions of the given game belong in the indexes."""
+    return (not game.is_demo and not game.is_private and game.stage == 'finished' and
+            game.result not in (None, 'aborted'))
+
+
+def game_postings(game_id, board) -> np.ndarray:
+    """Returns the position postings of the given board, every position only once with its first node."""
+    return _game_postings(game_id, board, lambda pos, size: (position_key(pos, size),))
+
+
+def game_pattern_postings(game_id, board) -> np.ndarray:
+    """Returns the pattern postings of the given board, every pattern only once with its first node."""
+    return _game_postings(game_id, board, pattern_keys)
+
+
+def _game_postings(game_id, board, keys_of):
+    nodes = {}
+    current_node_id = board.current_node_id
+
+    try:
+        for node in board.tree:
+            board.current_node_id = node.id
+
+            for key in keys_of(board.pos_array, board.size):
+                key = int(key)
+
+                if key and key not in nodes:
+                    nodes[key] = node.id
+    finally:
+        board.current_node_id = current_node_id
+
+    postings = np.empty(len(nodes), dtype=POSTING)
+    postings['key'] = list(nodes.keys())
+    postings['game_id'] = game_id
+    postings['node_id'] = list(nodes.values())
+
+    return postings
+
+
+class PositionIndex:
+    """Index stored at `path`, with new postings being appended to `path + '.new'`.
+
+    `postings` is the function returning the postings of a game, either `game_postings` or `game_pattern_postings`.
+
+    Appends are serialized with a lock on `path + '.lock'`, across threads and processes. While the index is rewritten,
+    which is serialized with a lock on `path + '.write.lock'`, the appended postings are moved to `path + '.merging'`
+    and new ones are appended to a fresh file. Searches read all three files.
+    """
+
+    def __init__(self, path, postings=game_postings):
+        self.path = path
+        self.new_path = path + '.new'
+        self.merging_path = path + '.merging'
+        self.lock_path = path + '.lock'
+        self.write_lock_path = path + '.write.lock'
+        self.postings = postings
+        self._maps = {}
+
+    def search(self, key) -> np.ndarray:
+        """Returns all postings of the given key."""
+        key = np.uint64(key)
+
+        # The files are read in the order in which postings move between them, so that a posting is seen at least once
+        # while it moves. Duplicates are removed.
+        new = self._map(self.new_path)
+        merging = self._map(self.merging_path)
+        main = self._map(self.path)
+
+        start = np.searchsorted(main['key'], key, side='left')
+        end = np.searchsorted(main['key'], key, side='right')
+
+        return np.unique(np.concatenate((main[start:end], merging[merging['key'] == key], new[new['key'] == key])))
+
+    def add(self, postings):
+        """Appends postings to the index, they become visible to searches immediately."""
+        with _locked(self.lock_path):
+            with open(self.new_path, 'ab') as f:
+                f.write(postings.tobytes())
+
+    def add_game(self, game):
+        if is_indexed(game):
+            self.add(self.postings(game.id, game.board))
+
+    def write(self, chunks):
+        """Replaces the whole index with the postings from the given iterable of arrays.
+
+        Postings appended before `chunks` is first read are dropped, they have to be part of `chunks`. Postings appended
+        after that are kept.
+        """
+        with _locked(self.write_lock_path):
+            self._rotate()
+            self._write(chunks)
+
+    def compact(self, min_postings=0) -> bool:
+        """Merges the appended postings into the sorted file if there are at least `min_postings` of them.
+
+        Returns whether the index was compacted. Nothing is done while another thread or process rewrites the index.
+        """
+        with _locked(self.write_lock_path, blocking=False) as locked:
+            if not locked:
+                return False
+
+            if not os.path.exists(self.merging_path) and len(self._map(self.new_path)) < min_postings:
+                return False
+
+            self._rotate()
+
+            main = self._map(self.path)
+            chunks = (main[i:i+WRITE_BATCH_SIZE] for i in range(0, len(main), WRITE_BATCH_SIZE))
+            self._write(_chain(chunks, [np.array(self._map(self.merging_path))]))
+
+        return True
+
+    def _rotate(self):
+        """Moves the appended postings to the merging file, unless a failed rewrite left one behind."""
+        with _locked(self.lock_path):
+            if os.path.exists(self.new_path) and not os.path.exists(self.merging_path):
+                os.replace(self.new_path, self.merging_path)
+
+    def _write(self, chunks):
+        """Writes the sorted file and removes the merging file.
+
+        The postings are first distributed into bucket files by the highest bits of their key, so that only a single
+        bucket has to be held in memory for sorting.
+        """
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(self.path)))
+
+        try:
+            buckets = [os.path.join(tmp_dir, str(i)) for i in range(1 << WRITE_BUCKET_BITS)]
+
+            for batch in _batches(chunks, WRITE_BATCH_SIZE):
+                _write_buckets(batch, buckets)
+
+            tmp_path = os.path.join(tmp_dir, 'index')
+
+            with open(tmp_path, 'wb') as f:
+                for bucket in buckets:
+                    if os.path.exists(bucket):
+                        f.write(np.sort(np.fromfile(bucket, dtype=POSTING), order=['key', 'game_id']).tobytes())
+
+            os.replace(tmp_path, self.path)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        if os.path.exists(self.merging_path):
+            os.remove(self.merging_path)
+
+    def __len__(self):
+        return sum(len(self._map(path)) for path in (self.path, self.merging_path, self.new_path))
+
+    def _map(self, path):
+        """Returns the memory-mapped postings of a file, mapping it again if it has changed."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=POSTING)
+
+        version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._maps.get(path)
+
+        if cached is None or cached[0] != version:
+            count = stat.st_size // POSTING.itemsize
+            postings = np.memmap(path, dtype=POSTING, mode='r', shape=(count,)) if count else np.empty(0, POSTING)
+            cached = self._maps[path] = (version, postings)
+
+        return cached[1]
+
+
+@contextmanager
+def _locked(path, blocking=True):
+    """Holds an exclusive lock on the given file, yields whether it was acquired if not `blocking`."""
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _chain(*iterables):
+    for it in iterables:
+        yield from it
+
+
+def _batches(chunks, size):
+    """Concatenates the given arrays into batches of at least `size` postings."""
+    batch, count = [], 0
+
+    for chunk in chunks:
+        batch.append(chunk)
+        count += len(chunk)
+
+        if count >= size:
+            yield np.concatenate(batch)
+            batch, count = [], 0
+
+    if batch:
+        yield np.concatenate(batch)
+
+
+def _write_buckets(postings, buckets):
+    """Appends every posting to the bucket file given by the highest bits of its key."""
+    bucket_of = (postings['key'] >> np.uint64(64 - WRITE_BUCKET_BITS)).astype(np.intp)
+    order = np.argsort(bucket_of, kind='mergesort')
+    postings = postings[order]
+    bounds = np.searchsorted(bucket_of[order], np.arange(len(buckets) + 1))
+
+    for i, bucket in enumerate(buckets):
+        if bounds[i] < bounds[i+1]:
+            with open(bucket, 'ab') as f:
+                f.write(postings[bounds[i]:bounds[i+1]].tobytes())
+
+
+def position_index() -> PositionIndex:
+    """Returns the index at `settings.POSITION_INDEX_PATH`."""
+    return _index(settings.POSITION_INDEX_PATH, game_postings)
+
+
+def pattern_index() -> PositionIndex:
+    """Returns the index at `settings.PATTERN_INDEX_PATH`."""
+    return _index(settings.PATTERN_INDEX_PATH, game_pattern_postings)
+
+
+def _index(path, postings):
+    index = _indexes.get(path)
+
+    if index is None:
+        index = _indexes[path] = PositionIndex(path, postings)
+
+    return index
+
+
+def index_game(db, game):
+    """Adds a finished game to the position and pattern indexes on the background thread once `db` commits."""
+    if is_indexed(game):
+        db.info.setdefault('indexed_games', []).append((game.id, game.board.fork()))
+
+
+@event.listens_for(Session, 'after_commit')
+def _index_committed_games(db):
+    for game_id, board in db.info.pop('indexed_games', []):
+        _executor.submit(_index_game, game_id, board)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_games(db):
+    db.info.pop('indexed_games', None)
+
+
+def _index_game(game_id, board):
+    for index in (position_index(), pattern_index()):
+        try:
+            index.add(index.postings(game_id, board))
+        except Exception:
+            logging.exception('failed to index game %d in %s', game_id, index.path)
+
+
+def compact_indexes():
+    """Compacts the position and pattern indexes on the background thread if enough postings were appended to them.
+
+    Returns a `Future` which is done once the index was compacted.
+    """
+    return _executor.submit(_compact_indexes)
+
+
+def _compact_indexes():
+    for index in (position_index(), pattern_index()):
+        try:
+            if index.compact(settings.POSITION_INDEX_COMPACT_POSTINGS):
+                logging.info("Compacted index %s", index.path)
+        except Exception:
+            logging.exception('failed to compact index %s', index.path)
+
+
+def wait_for_background_tasks():
+    """Blocks until all games and compactions submitted to the background thread so far are done."""
+    _executor.submit(lambda: None).result()
+
+
+def build_position_index():
+    """Rebuilds the position index from all games in the database."""
+    _build(position_index(), 'position')
+
+
+def build_pattern_index():
+    """Rebuilds the pattern index from all games in the database."""
+    _build(pattern_index(), 'pattern')
+
+
+def _build(index, name):
+    logging.info("Building %s index ...", name)
+    stats = {'games': 0, 'postings': 0}
+
+    def chunks():
+        with session() as db:
+            games = (db.query(Game).options(undefer('board_data'))
+                     .filter(Game.is_demo.is_(False), Game.is_private.is_(False), Game.stage == 'finished')
+                     .order_by(Game.id)
+                     .yield_per(100))
+
+            for game in games:
+                if is_indexed(game):
+                    postings = index.postings(game.id, game.board)
+                    stats['games'] += 1
+                    stats['postings'] += len(postings)
+                    yield postings
+
+    index.write(chunks())
+
+    logging.info("Indexed %d postings of %d games", stats['postings'], stats['games'])
@@ -16,58 +16,357 @@
 
 from collections import namedtuple
 
-from weiqi.board import EMPTY, BLACK, WHITE, neighbors, opposite
+import numpy as np
+from weiqi.board import (EMPTY, BLACK, WHITE, CODE_EMPTY, CODE_BLACK, CODE_WHITE, flood_fill, neighbor_table,
+                         bits_to_coords)
+from weiqi.cache import LRUCache
 
 Score = namedtuple('Score', ['white', 'black', 'komi', 'handicap', 'winner', 'win_by', 'result', 'points'])
 
+# Parameters of the influence function used by `estimate_score`.
+ESTIMATE_ITERATIONS = 4
+ESTIMATE_DECAY = 0.5
+ESTIMATE_THRESHOLD = 0.5
+
+# Empty regions of at least this size are counted as two eyes by `estimate_dead`.
+EYE_SPACE = 7
+
+# Estimated points keyed by board size, position hash and dead stones.
+_estimates = LRUCache(4096)
+
 
 def count_score(board, komi) -> Score:
     points = _assign_points(board)
     return _count_points(points, komi, board.handicap)
 
 
+def rescore(board, komi, points, changed) -> Score:
+    """Updates the points of a previous score after the dead marks of the stones in `changed` were toggled.
+
+    Only the regions containing or bordering on the changed stones are labeled again.
+    """
+    points = list(points)
+    labeled = bytearray(board.length)
+    pos = _live_pos(board)
+    neighbors = neighbor_table(board.size)
+
+    for coord in changed:
+        for c in (coord,) + neighbors[coord]:
+            code = pos[c]
+
+            if code != CODE_EMPTY:
+                points[c] = chr(code)
+            elif not labeled[c]:
+                _label_region(pos, board.size, c, points, labeled)
+
+    return _count_points(points, komi, board.handicap)
+
+
+def estimate_score(board, komi) -> Score:
+    """Estimates the score of a game which is still in progress.
+
+    Every stone spreads influence to the points around it, decaying with distance, with black counting positive and
+    white negative. Empty points belong to a color if its influence exceeds `ESTIMATE_THRESHOLD`, stones marked as dead
+    are ignored. Results are cached per position.
+    """
+    node = board.current_node
+    key = (board.size, board.position_hash, node.marked_dead if node else 0)
+    points = _estimates.get(key)
+
+    if points is None:
+        points = _influence_points(_live_pos(board), board.size)
+        _estimates[key] = points
+
+    return _count_points(list(points), komi, board.handicap)
+
+
+def _influence_points(pos, size):
+    stones = np.frombuffer(bytes(pos), dtype=np.int8).reshape(size, size)
+    source = (stones == CODE_BLACK).astype(float) - (stones == CODE_WHITE)
+
+    field = np.zeros((size+2, size+2))
+    influence = field[1:-1, 1:-1]
+    influence[...] = source
+
+    for _ in range(ESTIMATE_ITERATIONS):
+        influence[...] = source + ESTIMATE_DECAY * (field[:-2, 1:-1] + field[2:, 1:-1] + field[1:-1, :-2] +
+                                                    field[1:-1, 2:])
+
+    owner = np.where(influence >= ESTIMATE_THRESHOLD, CODE_BLACK,
+                     np.where(influence <= -ESTIMATE_THRESHOLD, CODE_WHITE, CODE_EMPTY)).astype(np.int8)
+    owner = np.where(stones != CODE_EMPTY, stones, owner)
+
+    return tuple(owner.tobytes().decode())
+
+
+def estimate_dead(board) -> set:
+    """Guesses which stones are dead at the end of a game.
+
+    Stones of one color which are connected through empty points form an area. An area is dead if it has fewer than
+    two eyes, is enclosed by the opponent and all of the opponent's areas bordering on it are larger, so that of two
+    equally large areas neither is dead. The search is repeated with the dead stones removed, since their points may
+    now be eyes of the surrounding stones.
+    """
+    pos = bytearray(board.pos_array)
+    dead = set()
+
+    while True:
+        areas, area_at = _areas(pos, board.size)
+        found = set()
+
+        for stones, region, border in areas:
+            if not border or _count_eyes(pos, board.size, region, pos[stones[0]]) >= 2:
+                continue
+
+            if (_is_enclosed(pos, board.size, region, border) and
+                    all(len(region) < len(areas[area_at[c]][1]) for c in border)):
+                found.update(stones)
+
+        if not found:
+            return dead
+
+        for coord in found:
+            pos[coord] = CODE_EMPTY
+
+        dead |= found
+
+
+def _areas(pos, size):
+    """Returns a list of `(stones, region, border)` tuples and the index into that list for every stone."""
+    areas = []
+    area_at = [None] * len(pos)
+
+    for coord, code in enumerate(pos):
+        if code == CODE_EMPTY or area_at[coord] is not None:
+            continue
+
+        region, border = flood_fill(pos, size, coord, (code, CODE_EMPTY))
+        stones = [c for c in region if pos[c] == code]
+
+        for c in stones:
+            area_at[c] = len(areas)
+
+        areas.append((stones, region, border))
+
+    return areas, area_at
+
+
+def _is_enclosed(pos, size, region, border):
+    """Returns whether the opponent's stones bordering an area separate it from other points.
+
+    This is the case if one of them is adjacent to an empty point or a stone of the area's color outside of the area.
+    Opponent stones which only border the area lie in the same open space as it and do not enclose it.
+    """
+    table = neighbor_table(size)
+
+    return any(c not in region and pos[c] != pos[stone] for stone in border for c in table[stone])
+
+
+def _count_eyes(pos, size, region, code):
+    """Counts the eyes in the given area, an empty region which touches no opponent stones counts as one eye or as two
+    if it has at least `EYE_SPACE` points."""
+    other = CODE_WHITE if code == CODE_BLACK else CODE_BLACK
+    seen = set()
+    eyes = 0
+
+    for coord in region:
+        if pos[coord] != CODE_EMPTY or coord in seen:
+            continue
+
+        result = flood_fill(pos, size, coord, (CODE_EMPTY,))
+        space = result[0]
+        seen |= space
+
+        if not any(pos[c] == other for c in result[1]):
+            eyes += 2 if len(space) >= EYE_SPACE else 1
+
+    return eyes
+
+
+def count_scores(positions, dead, komi, handicap=0) -> list:
+    """Scores a stack of positions at once and returns a `Score` for each of them.
+
+    `positions` is an (N, size, size) int8 array of point codes (`CODE_EMPTY`, `CODE_BLACK`, `CODE_WHITE`) and `dead`
+    a boolean array of the same shape marking dead stones. `komi` and `handicap` are either single values or one value
+    per position. Points are assigned with the same rules as `count_score` and counted for all positions at once.
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    dead = np.asarray(dead, dtype=bool)
+    count = len(positions)
+
+    live = np.where(dead, np.int8(CODE_EMPTY), positions)
+    empty = live == CODE_EMPTY
+    labels = _label_regions(empty)
+
+    touches_black = (_touches(live == CODE_BLACK) & empty).ravel()
+    touches_white = (_touches(live == CODE_WHITE) & empty).ravel()
+    region_black = np.bincount(labels.ravel(), weights=touches_black, minlength=labels.size+1) > 0
+    region_white = np.bincount(labels.ravel(), weights=touches_white, minlength=labels.size+1) > 0
+
+    owner = np.where(region_white, np.where(region_black, CODE_EMPTY, CODE_WHITE), CODE_BLACK).astype(np.int8)
+    points = np.where(empty, owner[labels], live).reshape(count, -1)
+
+    komi = np.broadcast_to(np.asarray(komi, dtype=float), (count,))
+    handicap = np.broadcast_to(np.asarray(handicap), (count,))
+    black = (points == CODE_BLACK).sum(axis=1)
+    white = (points == CODE_WHITE).sum(axis=1) + komi + handicap
+    win_by = np.abs(white - black)
+
+    # All points are decoded at once, every score gets a list of its slice.
+    length = points.shape[1]
+    codes = points.tobytes().decode()
+    scores = []
+
+    for i, (w, b, k, h, by) in enumerate(zip(white.tolist(), black.tolist(), komi.tolist(), handicap.tolist(),
+                                              win_by.tolist())):
+        winner = WHITE if w > b else BLACK
+        result = '{}+{:.1f}'.format('W' if winner == WHITE else 'B', by)
+        scores.append(Score(w, b, k, h, winner, by, result, list(codes[i*length:(i+1)*length])))
+
+    return scores
+
+
+def positions_from_boards(boards):
+    """Returns the positions and dead stone masks of the given boards in the form expected by `count_scores`."""
+    sizes = {board.size for board in boards}
+    if len(sizes) > 1:
+        raise ValueError('boards must have the same size')
+
+    size = sizes.pop() if sizes else 0
+    positions = np.empty((len(boards), size, size), dtype=np.int8)
+    dead = np.zeros((len(boards), size, size), dtype=bool)
+
+    for i, board in enumerate(boards):
+        positions[i] = np.frombuffer(bytes(board.pos_array), dtype=np.int8).reshape(size, size)
+
+        node = board.current_node
+        if node and node.marked_dead:
+            dead[i].flat[bits_to_coords(node.marked_dead)] = True
+
+    return positions, dead
+
+
+def _label_regions(mask):
+    """Labels the connected regions of a stack of boolean masks.
+
+    Every region gets the largest flat index (plus one) of its points as label, points outside the mask are 0. Each
+    pass spreads the largest label along horizontal and vertical runs of the mask, and then lets every point take over
+    the label of the point its label refers to. Passes are repeated until nothing changes anymore.
+    """
+    mask_t = np.ascontiguousarray(mask.transpose(0, 2, 1))
+    rows, cols = _runs(mask), _runs(mask_t)
+    labels = np.where(mask, np.arange(1, mask.size+1).reshape(mask.shape), 0)
+
+    if not mask.any():
+        return labels
+
+    while True:
+        previous = labels.copy()
+
+        starts, run = rows
+        labels[mask] = np.maximum.reduceat(labels[mask], starts)[run]
+
+        labels_t = np.ascontiguousarray(labels.transpose(0, 2, 1))
+        starts, run = cols
+        labels_t[mask_t] = np.maximum.reduceat(labels_t[mask_t], starts)[run]
+        labels = np.ascontiguousarray(labels_t.transpose(0, 2, 1))
+
+        flat = labels.ravel()
+        flat[:] = np.maximum(flat, flat[np.maximum(flat-1, 0)]) * (flat > 0)
+
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def _runs(mask):
+    """Finds the horizontal runs of a stack of boolean masks.
+
+    Returns the start of every run and the run of every point, both relative to the points inside the mask.
+    """
+    start = mask.copy()
+    start[..., 1:] &= ~mask[..., :-1]
+    start = start[mask]
+
+    return np.flatnonzero(start), np.cumsum(start) - 1
+
+
+def _touches(mask):
+    """Returns which points of a stack of boolean masks have a neighbor inside the mask."""
+    padded = np.pad(mask, ((0, 0), (1, 1), (1, 1)), mode='constant')
+    return padded[:, :-2, 1:-1] | padded[:, 2:, 1:-1] | padded[:, 1:-1, :-2] | padded[:, 1:-1, 2:]
+
+
 def _assign_points(board):
+    """Assigns every point to the color owning it.
+
+    Stones belong to their color. Every region of empty points and dead stones is labeled once and belongs to a color
+    if it borders only on stones of that color. Regions bordering on both colors stay neutral.
+    """
     points = [EMPTY] * board.length
+    labeled = bytearray(board.length)
+    pos = _live_pos(board)
 
     for coord in range(board.length):
-        if points[coord] != EMPTY:
-            continue
+        code = pos[coord]
 
-        only_black, visited = can_reach_only(board, coord, BLACK)
-        if only_black:
-            for c in visited:
-                points[c] = BLACK
+        if code != CODE_EMPTY:
+            points[coord] = chr(code)
             continue
 
-        only_white, visited = can_reach_only(board, coord, WHITE)
-        if only_white:
-            for c in visited:
-                points[c] = WHITE
-            continue
+        if not labeled[coord]:
+            _label_region(pos, board.size, coord, points, labeled)
 
     return points
 
 
-def can_reach_only(board, coord, color, visited=None):
+def _label_region(pos, size, coord, points, labeled):
+    """Assigns the region of empty points containing `coord` to the color bordering on it, if there is only one."""
+    region, border = flood_fill(pos, size, coord, (CODE_EMPTY,))
+    colors = {pos[c] for c in border}
+
+    if CODE_WHITE not in colors:
+        owner = BLACK
+    elif CODE_BLACK not in colors:
+        owner = WHITE
+    else:
+        owner = EMPTY
+
+    for c in region:
+        labeled[c] = 1
+        points[c] = owner
+
+
+def can_reach_only(board, coord, color):
     """Checks if from a given origin only stones of the given color can be reached."""
-    if not visited:
-        visited = set()
-    elif coord in visited:
-        return True, visited
+    return _reach_only(_live_pos(board), board.size, coord, color)
+
+
+def _live_pos(board):
+    """Returns a copy of the position in which stones marked as dead are removed."""
+    pos = bytearray(board.pos_array)
+    node = board.current_node
+
+    if node and node.marked_dead:
+        for coord in bits_to_coords(node.marked_dead):
+            pos[coord] = CODE_EMPTY
+
+    return pos
+
 
-    visited.add(coord)
+def _reach_only(pos, size, coord, color):
+    code = pos[coord]
 
-    if not board.is_marked_dead(coord) and board.at(coord) == color:
-        return True, visited
+    if code != CODE_EMPTY:
+        return code == ord(color), {coord}
 
-    if not board.is_marked_dead(coord) and board.at(coord) == opposite(color):
-        return False, visited
+    other = CODE_WHITE if color == BLACK else CODE_BLACK
+    result = flood_fill(pos, size, coord, (CODE_EMPTY,), (other,))
 
-    for n in neighbors(coord, board.size):
-        if not can_reach_only(board, n, color, visited)[0]:
-            return False, visited
+    if result is None:
+        return False, set()
 
-    return True, visited
+    region, border = result
+    return True, region | border
 
 
 def _count_points(points, komi, handicap):
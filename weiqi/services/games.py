@@ -14,18 +14,27 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
 from contextlib import contextmanager
 from datetime import datetime
 
+from sqlalchemy import func
 from sqlalchemy.orm import undefer
-from weiqi import settings
-from weiqi.board import RESIGN, BLACK, SYMBOL_TRIANGLE, SYMBOL_CIRCLE, SYMBOL_SQUARE
+from weiqi import settings, metrics
+from weiqi.board import (RESIGN, BLACK, SYMBOL_TRIANGLE, SYMBOL_CIRCLE, SYMBOL_SQUARE, points_to_bits,
+                         points_from_bits, coords_to_bits)
+from weiqi.cache import LRUCache
 from weiqi.db import transaction
-from weiqi.models import Game, Timing
-from weiqi.scoring import count_score
+from weiqi.encoding import compress_board
+from weiqi.models import Game, GameArchive, Timing
+from weiqi.position_index import index_game
+from weiqi.scoring import count_score, rescore, estimate_score, estimate_dead
 from weiqi.services import BaseService, ServiceError, UserService, RatingService, RoomService, CorrespondenceService
 from weiqi.timing import update_timing, update_timing_after_move
 
+# Positions of non-demo games keyed by game and node id, see `GameService.position`.
+_positions = LRUCache(4096)
+
 
 class InvalidPlayerError(ServiceError):
     pass
@@ -105,7 +114,11 @@ class GameService(BaseService):
                 if game.stage == 'finished':
                     self._finish_game(game)
 
-            game.apply_board_change()
+            # Moves of running games only add a node, everything else may change existing nodes as well.
+            if game.is_demo or game.stage != 'playing':
+                game.apply_board_change()
+            else:
+                game.append_board_nodes()
 
             self.db.commit()
 
@@ -141,7 +154,7 @@ class GameService(BaseService):
     @contextmanager
     def _game_for_update(self, game_id):
         with transaction(self.db):
-            game = self.db.query(Game).options(undefer('board')).with_for_update().get(game_id)
+            game = self.db.query(Game).options(undefer('board_data')).with_for_update().get(game_id)
             yield game
 
     def _game_move_demo(self, game, move):
@@ -183,6 +196,7 @@ class GameService(BaseService):
 
         if game.board.both_passed:
             game.stage = 'counting'
+            game.board.writable_node().marked_dead = coords_to_bits(estimate_dead(game.board))
             self._update_score(game)
 
     def _resign(self, game):
@@ -202,10 +216,17 @@ class GameService(BaseService):
         else:
             game.result = 'B+T'
 
-    def _update_score(self, game):
-        score = count_score(game.board, game.komi)
+    def _update_score(self, game, changed=None):
+        """Updates the score of the current node, only rescoring around `changed` stones if a previous score exists."""
+        points = game.board.current_node.score_points
+
+        if changed is not None and points:
+            score = rescore(game.board, game.komi, points_from_bits(points, game.board.length), changed)
+        else:
+            score = count_score(game.board, game.komi)
+
         game.result = score.result
-        game.board.current_node.score_points = score.points
+        game.board.writable_node().score_points = points_to_bits(score.points)
 
     def _publish_game_update(self, game):
         self.socket.publish('game_update/'+str(game.id), {
@@ -213,7 +234,7 @@ class GameService(BaseService):
             'stage': game.stage,
             'result': game.result,
             'timing': game.timing.to_frontend() if game.timing else None,
-            'node': game.board.current_node.to_dict() if game.board.current_node else {},
+            'node': game.board.current_node.to_dict(game.board.length) if game.board.current_node else {},
         })
 
     @BaseService.authenticated
@@ -226,13 +247,79 @@ class GameService(BaseService):
             if game.stage != 'counting':
                 raise InvalidStageError()
 
-            game.board.toggle_marked_dead(coord)
-            self._update_score(game)
+            changed = game.board.toggle_marked_dead(coord)
+            self._update_score(game, changed)
             game.apply_board_change()
 
             self.db.commit()
             self._publish_game_update(game)
 
+    @BaseService.register
+    def estimate(self, game_id):
+        """Returns an estimate of the current score.
+
+        Only reads the game, so it does not wait for or block moves being played.
+        """
+        game = self.db.query(Game).options(undefer('board_data')).filter_by(id=game_id).one()
+
+        if game.is_private and game.black_user != self.user and game.white_user != self.user:
+            raise NotAllowedError('this game is private')
+
+        score = estimate_score(game.board, game.komi)
+
+        return {
+            'game_id': game.id,
+            'node_id': game.board.current_node_id,
+            'black': score.black,
+            'white': score.white,
+            'result': score.result,
+            'points': score.points,
+        }
+
+    @BaseService.register
+    def position(self, game_id, node_id):
+        """Returns the position at the given node.
+
+        Nodes of games other than demos never change once played, so their positions are cached and scrubbing through
+        a game does not load and replay the board again.
+        """
+        game = self.db.query(Game).filter_by(id=game_id).one()
+
+        if game.is_private and game.black_user != self.user and game.white_user != self.user:
+            raise NotAllowedError('this game is private')
+
+        position = None if game.is_demo else _positions.get((game.id, node_id))
+
+        if position is None:
+            position = self._position(game, node_id)
+
+            if not game.is_demo:
+                _positions[(game.id, node_id)] = position
+
+        return position
+
+    def _position(self, game, node_id):
+        board = game.board
+
+        if not isinstance(node_id, int) or not 0 <= node_id < len(board.tree):
+            raise ServiceError('invalid node_id')
+
+        current_node_id = board.current_node_id
+        board.current_node_id = node_id
+
+        try:
+            return {
+                'game_id': game.id,
+                'node_id': node_id,
+                'size': board.size,
+                'pos': board.pos_array.decode(),
+                'current': board.current,
+                'captures': list(board.current_node.captures),
+                'ko': board.ko,
+            }
+        finally:
+            board.current_node_id = current_node_id
+
     @BaseService.authenticated
     @BaseService.register
     def confirm_score(self, game_id, result):
@@ -259,12 +346,16 @@ class GameService(BaseService):
         if game.is_demo or game.stage != 'finished':
             return
 
+        game.apply_board_change()
+
         if game.board.moves_played <= game.board.size:
             game.result = 'aborted'
 
         if game.is_ranked:
             RatingService(self.db).update_ratings(game)
 
+        index_game(self.db, game)
+
         self.socket.publish('game_finished', game.to_frontend())
         self._publish_game_data(game)
 
@@ -340,7 +431,7 @@ class GameService(BaseService):
 
     @contextmanager
     def _demo_tool(self, game_id):
-        game = self.db.query(Game).options(undefer('board')).get(game_id)
+        game = self.db.query(Game).options(undefer('board_data')).get(game_id)
 
         if not game.is_demo or not game.demo_control == self.user:
             raise InvalidPlayerError()
@@ -348,7 +439,7 @@ class GameService(BaseService):
         if not game.board.current_node:
             game.board.add_edits([], [], [])
 
-        node = game.board.current_node
+        node = game.board.writable_node()
 
         yield game, node
 
@@ -372,7 +463,7 @@ class GameService(BaseService):
 
     def check_due_moves(self):
         """Checks and updates all timings which are due for a move being played."""
-        timings = self.db.query(Timing).with_for_update().join('game').options(undefer('game.board')).filter(
+        timings = self.db.query(Timing).with_for_update().join('game').options(undefer('game.board_data')).filter(
             (Game.is_demo.is_(False)) & (Game.stage == 'playing') & (Timing.next_move_at <= datetime.utcnow()))
 
         for timing in timings:
@@ -380,6 +471,38 @@ class GameService(BaseService):
                 self._win_by_time(timing.game)
                 self._finish_game(timing.game)
 
+    def archive_games(self):
+        """Moves the boards of finished games to compressed storage.
+
+        At most `settings.ARCHIVE_GAMES_BATCH_SIZE` games are archived per call. Returns the number of archived games
+        and the number of bytes saved, which is negative if compression did not pay off for tiny boards.
+        """
+        stored_size = func.length(Game.board_data)
+        games = (self.db.query(Game, stored_size).options(undefer('board_data')).with_for_update()
+                 .filter(Game.is_demo.is_(False), Game.stage == 'finished', Game.board_data.isnot(None),
+                         Game.updated_at < datetime.utcnow() - settings.ARCHIVE_GAMES_AFTER)
+                 .order_by(Game.id)
+                 .limit(settings.ARCHIVE_GAMES_BATCH_SIZE))
+
+        count = stored = compressed = 0
+
+        for game, size in games:
+            data = compress_board(game.board)
+            game.archive = GameArchive(data=data)
+            game.board_data = None
+
+            count += 1
+            stored += size
+            compressed += len(data)
+
+        if count:
+            metrics.ARCHIVED_GAMES.inc(count)
+            metrics.ARCHIVED_BOARD_BYTES.inc(stored)
+            metrics.ARCHIVED_COMPRESSED_BYTES.inc(compressed)
+            logging.info("Archived %d games, compressed %d bytes to %d bytes", count, stored, compressed)
+
+        return count, stored - compressed
+
     def resume_all_games(self):
         """Gracefully resumes all games on startup.
 
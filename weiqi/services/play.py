@@ -42,13 +42,20 @@ class ChallengePrivateCannotBeRankedError(ServiceError):
     pass
 
 
+class InvalidSuperkoError(ServiceError):
+    pass
+
+
 class PlayService(BaseService):
     """Service which handles the creation of games."""
     __service_name__ = 'play'
 
     @BaseService.authenticated
     @BaseService.register
-    def automatch(self, preset, max_hc):
+    def automatch(self, preset, max_hc, superko=False):
+        if not isinstance(superko, bool):
+            raise InvalidSuperkoError()
+
         start, end = rating_range(self.user.rating, max_hc)
         game = None
 
@@ -69,19 +76,21 @@ class PlayService(BaseService):
                                  Automatch.max_rating >= self.user.rating,
                                  Automatch.user_rating >= start,
                                  Automatch.user_rating <= end,
-                                 Automatch.preset == preset)
+                                 Automatch.preset == preset,
+                                 Automatch.superko.is_(superko))
             query = query.order_by(Automatch.created_at)
             other = query.first()
 
             if other:
-                game = self._create_automatch_game(self.user, other.user, preset)
+                game = self._create_automatch_game(self.user, other.user, preset, superko)
                 self.db.delete(other)
             else:
                 item = Automatch(preset=preset,
                                  user=self.user,
                                  user_rating=self.user.rating,
                                  min_rating=start,
-                                 max_rating=end)
+                                 max_rating=end,
+                                 superko=superko)
                 self.db.add(item)
 
         if game:
@@ -94,7 +103,7 @@ class PlayService(BaseService):
         else:
             self._publish_automatch(self.user, True)
 
-    def _create_automatch_game(self, user, other, preset):
+    def _create_automatch_game(self, user, other, preset, superko):
         black, white, handicap = self.game_players_handicap(user, other)
         komi = settings.DEFAULT_KOMI if handicap == 0 else settings.HANDICAP_KOMI
         timing_preset = settings.AUTOMATCH_PRESETS[preset]
@@ -102,7 +111,7 @@ class PlayService(BaseService):
 
         return self._create_game(True, correspondence, black, white, handicap, komi, settings.AUTOMATCH_SIZE,
                                  'fischer', timing_preset['capped'], timing_preset['main'], timing_preset['overtime'],
-                                 0, False)
+                                 0, False, superko)
 
     @BaseService.authenticated
     @BaseService.register
@@ -173,7 +182,7 @@ class PlayService(BaseService):
         demo = Game(is_demo=True,
                     is_ranked=False,
                     room=room,
-                    board=game.board,
+                    board=game.board.fork(),
                     komi=game.komi,
                     stage='finished',
                     black_display=game.black_display,
@@ -214,7 +223,7 @@ class PlayService(BaseService):
     @BaseService.authenticated
     @BaseService.register
     def challenge(self, user_id, size, handicap, komi, owner_is_black, speed, timing, maintime, overtime,
-                  overtime_count, private=False, ranked=False):
+                  overtime_count, private=False, ranked=False, superko=False):
         other = self.db.query(User).filter_by(id=user_id).one()
         correspondence = (speed == 'correspondence')
 
@@ -246,6 +255,9 @@ class PlayService(BaseService):
         if private and ranked:
             raise ChallengePrivateCannotBeRankedError()
 
+        if not isinstance(superko, bool):
+            raise InvalidSuperkoError()
+
         if handicap is None or ranked:
             black, white, handicap = self.game_players_handicap(self.user, other)
             owner_is_black = (black == self.user)
@@ -272,6 +284,7 @@ class PlayService(BaseService):
                               handicap=handicap,
                               komi=komi,
                               owner_is_black=owner_is_black,
+                              superko=superko,
                               is_correspondence=correspondence,
                               timing_system=timing,
                               maintime=maintime,
@@ -317,7 +330,7 @@ class PlayService(BaseService):
         game = self._create_game(challenge.is_ranked, challenge.is_correspondence, black, white, challenge.handicap,
                                  challenge.komi, challenge.board_size, challenge.timing_system,
                                  challenge.is_correspondence, challenge.maintime, challenge.overtime,
-                                 challenge.overtime_count, challenge.is_private)
+                                 challenge.overtime_count, challenge.is_private, challenge.superko)
 
         self.db.commit()
 
@@ -349,8 +362,8 @@ class PlayService(BaseService):
                      black, white,
                      handicap, komi, size,
                      timing_system, capped, maintime, overtime, overtime_count,
-                     private):
-        board = Board(size, handicap)
+                     private, superko):
+        board = Board(size, handicap, superko)
 
         room = Room(type='game')
         ru = RoomUser(room=room, user=black)
@@ -14,10 +14,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import numpy as np
 from weiqi import settings
+from weiqi.board import BLACK, WHITE, EMPTY
 from weiqi.models import User, Game
-from weiqi.paginator import paginate
-from weiqi.services import BaseService
+from weiqi.paginator import paginate, page_range
+from weiqi.position_index import position_index, position_key, pattern_index, pattern_key, PATTERN_WINDOWS
+from weiqi.services import BaseService, ServiceError
 
 
 class SearchService(BaseService):
@@ -69,3 +72,57 @@ class SearchService(BaseService):
             'total_results': page_info['total_results'],
             'results': results,
         }
+
+    @BaseService.register
+    def position(self, size, pos, page=1):
+        """Returns the games in which the given position or one of its rotations and reflections occurred.
+
+        The position is given as a string of colors. Every result contains the id of the first node with the position.
+        """
+        if not isinstance(pos, str):
+            raise ServiceError('invalid position')
+
+        if size not in [9, 13, 19] or len(pos) != size*size or not set(pos) <= {BLACK, WHITE, EMPTY}:
+            raise ServiceError('invalid position')
+
+        postings = position_index().search(position_key(pos.encode(), size))
+        return self._posting_results(postings, page)
+
+    @BaseService.register
+    def pattern(self, size, kind, pattern, page=1):
+        """Returns the games in which the given local pattern occurred in any corner or on any side.
+
+        `kind` is either 'corner' or 'side' and the pattern is given as string of colors, row by row, in the
+        orientation of the top left corner or the top side. Matches include rotations, reflections and swapped colors.
+        """
+        rows, cols = PATTERN_WINDOWS.get(kind, (0, 0))
+
+        if not isinstance(pattern, str):
+            raise ServiceError('invalid pattern')
+
+        if size not in [9, 13, 19] or len(pattern) != rows*cols or not set(pattern) <= {BLACK, WHITE, EMPTY}:
+            raise ServiceError('invalid pattern')
+
+        return self._posting_results(pattern_index().search(pattern_key(kind, pattern, size)), page)
+
+    def _posting_results(self, postings, page):
+        """Returns a page of the games in the given postings, newest games first."""
+        postings = np.sort(postings, order='game_id')[::-1]
+
+        limit = settings.SEARCH_RESULTS_PER_PAGE
+        total_results = len(postings)
+        page, total_pages = page_range(total_results, limit, page)
+        postings = postings[(page-1)*limit:page*limit]
+
+        game_ids = [int(game_id) for game_id in postings['game_id']]
+        games = {g.id: g for g in self.db.query(Game).filter(Game.id.in_(game_ids))} if game_ids else {}
+
+        results = [dict(games[game_id].to_frontend(), node_id=int(node_id))
+                   for game_id, node_id in zip(game_ids, postings['node_id']) if game_id in games]
+
+        return {
+            'page': page,
+            'total_pages': total_pages,
+            'total_results': total_results,
+            'results': results,
+        }
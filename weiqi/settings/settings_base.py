@@ -118,3 +118,19 @@ MAX_USER_INFO_TEXT_LENGTH = 10000
 TIMING_MAIN_CAP_MULTIPLIER = 2
 
 SEARCH_RESULTS_PER_PAGE = 10
+
+# Boards of finished games are moved to compressed storage once the game did not change for this long.
+# The archiver runs every `ARCHIVE_GAMES_INTERVAL` and archives at most `ARCHIVE_GAMES_BATCH_SIZE` games per run.
+ARCHIVE_GAMES_AFTER = timedelta(days=7)
+ARCHIVE_GAMES_INTERVAL = timedelta(minutes=1)
+ARCHIVE_GAMES_BATCH_SIZE = 100
+
+# Location of the position and pattern indexes, which are built with the `--build_position_index` and
+# `--build_pattern_index` options.
+POSITION_INDEX_PATH = 'positions.idx'
+PATTERN_INDEX_PATH = 'patterns.idx'
+
+# Postings of games finished while the server runs are merged into the indexes every `POSITION_INDEX_COMPACT_INTERVAL`
+# once there are at least `POSITION_INDEX_COMPACT_POSTINGS` of them.
+POSITION_INDEX_COMPACT_INTERVAL = timedelta(minutes=10)
+POSITION_INDEX_COMPACT_POSTINGS = 100000
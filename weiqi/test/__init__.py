@@ -15,6 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import tempfile
 
 from sqlalchemy.orm import scoped_session
 from weiqi import settings
@@ -24,6 +25,8 @@ settings.DEBUG = False
 settings.DB_URL = os.environ.get('WEIQI_TEST_DB', 'sqlite://')
 settings.RECAPTCHA['backend'] = 'dummy'
 settings.MAILER['backend'] = 'console'
+settings.POSITION_INDEX_PATH = os.path.join(tempfile.mkdtemp(), 'positions.idx')
+settings.PATTERN_INDEX_PATH = os.path.join(tempfile.mkdtemp(), 'patterns.idx')
 
 create_db()
 create_schema()
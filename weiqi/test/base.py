@@ -19,7 +19,8 @@ from unittest import TestCase
 
 from tornado.testing import AsyncHTTPTestCase
 from weiqi.application import create_app
-from weiqi.models import User, RoomMessage, RoomUser, Room, DirectRoom, Connection, Automatch, Game, Timing, Challenge
+from weiqi.models import (User, RoomMessage, RoomUser, Room, DirectRoom, Connection, Automatch, Game, GameNode,
+                          GameArchive, Timing, Challenge)
 from weiqi.test import session
 
 
@@ -34,6 +35,8 @@ class BaseTestCase(TestCase):
         session.query(DirectRoom).delete()
         session.query(Automatch).delete()
         session.query(Timing).delete()
+        session.query(GameNode).delete()
+        session.query(GameArchive).delete()
         session.query(Game).delete()
         session.query(Room).delete()
         session.query(Challenge).delete()
@@ -0,0 +1,210 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+import pytest
+from weiqi.board import Board, PASS, BLACK, flood_fill, board_from_dict, IllegalMoveError, CODE_EMPTY, CODE_BLACK
+from weiqi.encoding import encode_board, decode_board
+from weiqi.sgf import parse_sgf
+from weiqi.test.fixtures import GAME_194_MOVES, game_moves, play_moves
+
+
+def test_play_board(benchmark):
+    moves = game_moves(parse_sgf(GAME_194_MOVES).children[0])
+
+    board = benchmark(play_moves, moves)
+
+    assert board.moves_played == 194
+
+
+@pytest.mark.parametrize('size', [9, 13, 19])
+def test_play_random_game(benchmark, size):
+    moves = random_game(size, size*size)
+
+    board = benchmark(play_moves, moves, size)
+
+    assert board.moves_played == len(moves)
+
+
+def test_play_captures(benchmark):
+    moves = random_game(9, 1000)
+
+    board = benchmark(play_moves, moves, 9)
+
+    assert sum(len(node.captures) for node in board.tree) > 500
+
+
+def test_play_ko(benchmark):
+    # Black and white keep retaking the ko at 21 and 22, both passing in between instead of playing ko threats.
+    setup = [12, 13, 20, 23, 30, 31, 80, 21]
+    fight = [22, PASS, PASS, 21, PASS, PASS] * 50
+
+    board = benchmark(play_moves, setup + fight, 9)
+
+    assert sum(len(node.captures) for node in board.tree) == 100
+
+
+@pytest.mark.parametrize('depth', [10, 100, 193])
+def test_rebuild_pos(benchmark, depth):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    board.current_node_id = depth
+
+    benchmark(board._rebuild_pos, from_root=True)
+
+    assert board._pos_depth == depth
+
+
+def test_rebuild_pos_checkpoint(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    board.current_node_id = 193
+
+    benchmark(board._rebuild_pos)
+
+    assert board._pos_depth == 193
+
+
+def test_board_to_dict(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    data = benchmark(board.to_dict)
+
+    assert len(data['tree']) == 194
+
+
+def test_board_to_dict_compact(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    data = benchmark(board.to_dict, compact=True)
+
+    assert len(data['tree']) == 194
+
+
+def test_board_from_dict(benchmark):
+    data = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0])).to_dict(compact=True)
+
+    board = benchmark(board_from_dict, data)
+
+    assert len(board.tree) == 194
+
+
+def test_random_node_jumps(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    node_ids = random.Random(0).sample(range(len(board.tree)), 100)
+
+    benchmark(jump_to_nodes, board, node_ids)
+
+
+def test_step_through_game(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    node_ids = list(range(len(board.tree)))
+
+    benchmark(jump_to_nodes, board, node_ids + node_ids[::-1])
+
+
+def test_flood_fill_empty_board(benchmark):
+    pos = bytearray([CODE_EMPTY])*361
+
+    region, _ = benchmark(flood_fill, pos, 19, 180, (CODE_EMPTY,))
+
+    assert len(region) == 361
+
+
+def test_flood_fill_full_board(benchmark):
+    pos = bytearray([CODE_BLACK])*361
+
+    region, _ = benchmark(flood_fill, pos, 19, 0, (CODE_BLACK,))
+
+    assert len(region) == 361
+
+
+def test_legal_moves(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    legal = benchmark(board.legal_moves)
+
+    assert legal == naive_legal_moves(board)
+
+
+def test_legal_moves_naive(benchmark):
+    data = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0])).to_dict()
+
+    benchmark.pedantic(naive_legal_moves, setup=lambda: ((board_from_dict(data),), {}), rounds=20)
+
+
+def test_encode_board(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    data = benchmark(encode_board, board)
+
+    assert decode_board(data).to_dict() == board.to_dict()
+
+
+def test_decode_board(benchmark):
+    data = encode_board(play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0])))
+
+    tree = benchmark(lambda: decode_board(data).tree)
+
+    assert len(tree) == 194
+
+
+def test_decode_board_current(benchmark):
+    data = encode_board(play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0])))
+
+    current = benchmark(lambda: decode_board(data).current)
+
+    assert current == BLACK
+
+
+def jump_to_nodes(board, node_ids):
+    for node_id in node_ids:
+        board.current_node_id = node_id
+        board.pos_array
+
+
+def naive_legal_moves(board):
+    node_id = board.current_node_id
+    legal = bytearray(board.length)
+
+    for coord in range(board.length):
+        try:
+            board.play(coord)
+        except IllegalMoveError:
+            continue
+
+        legal[coord] = 1
+        board.current_node_id = node_id
+
+    return legal
+
+
+def random_game(size, count, seed=0):
+    """Returns `count` random legal moves, long games on small boards contain a lot of captures.
+
+    Players pass if they have no legal move left.
+    """
+    rnd = random.Random(seed)
+    board = Board(size)
+    moves = []
+
+    while len(moves) < count:
+        legal = [coord for coord, ok in enumerate(board.legal_moves()) if ok]
+        move = rnd.choice(legal) if legal else PASS
+
+        board.play(move)
+        moves.append(move)
+
+    return moves
@@ -0,0 +1,96 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from datetime import datetime
+
+import pytest
+from weiqi import codec
+from weiqi.models import Game
+from weiqi.sgf import parse_sgf
+from weiqi.test.fixtures import GAME_194_MOVES, game_moves, play_moves
+
+CODECS = codec.available_codecs()
+
+
+@pytest.fixture(params=[c[1] for c in CODECS], ids=[c[0] for c in CODECS])
+def dumps_loads(request):
+    return request.param
+
+
+def test_dumps_game_data(benchmark, dumps_loads):
+    dumps, loads = dumps_loads
+    message = game_data_message()
+
+    data = benchmark(dumps, message)
+
+    assert loads(data) == message
+
+
+def test_loads_game_data(benchmark, dumps_loads):
+    dumps, loads = dumps_loads
+    data = dumps(game_data_message())
+
+    message = benchmark(loads, data)
+
+    assert len(message['data']['board']['tree']) == 194
+
+
+def test_dumps_game_update(benchmark, dumps_loads):
+    dumps, loads = dumps_loads
+    message = game_update_message()
+
+    data = benchmark(dumps, message)
+
+    assert loads(data) == message
+
+
+def test_loads_game_update(benchmark, dumps_loads):
+    dumps, loads = dumps_loads
+    data = dumps(game_update_message())
+
+    message = benchmark(loads, data)
+
+    assert message['data']['node']['move'] is not None
+
+
+def game_data_message():
+    """Returns the message sent to players and spectators when they open a game of 194 moves."""
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    game = Game(id=1, board=board, created_at=datetime(2016, 1, 1), black_display='black', white_display='white',
+                komi=7.5, stage='playing', title='', result='', result_black_confirmed='', result_white_confirmed='')
+
+    return {'method': 'game_data', 'data': game.to_frontend(full=True)}
+
+
+def game_update_message():
+    """Returns the message sent after a move was played."""
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    return {'method': 'game_update', 'data': {
+        'game_id': 1,
+        'stage': 'playing',
+        'result': '',
+        'timing': {
+            'system': 'byoyomi',
+            'start_at': datetime(2016, 1, 1).isoformat(),
+            'timing_updated_at': datetime(2016, 1, 1, 0, 40).isoformat(),
+            'black_main': 120.5,
+            'white_main': 98.2,
+            'black_overtime': 150.0,
+            'white_overtime': 150.0,
+        },
+        'node': board.current_node.to_dict(board.length),
+    }}
@@ -0,0 +1,77 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from weiqi.board import board_from_string, coord2d
+from weiqi import scoring
+from weiqi.scoring import count_score, count_scores, positions_from_boards, estimate_score
+from weiqi.sgf import parse_sgf
+from weiqi.test.fixtures import GAME_194_MOVES, game_moves, play_moves
+
+
+def test_count_score(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    score = benchmark(count_score, board, 7.5)
+
+    assert len(score.points) == 361
+
+
+def test_count_score_dame(benchmark):
+    # Every other column is a neutral region touching both colors.
+    board = board_from_string(('x.o.'*5)[:19]*19, 19)
+
+    score = benchmark(count_score, board, 7.5)
+
+    assert score.points.count('.') == 9*19
+
+
+def test_count_score_endgame(benchmark):
+    # Both sides have large territories separated by walls, with dead stones inside.
+    rows = ['.'*8 + 'xo' + '.'*9] * 19
+    rows[3] = '...o....xo.....x...'
+    rows[15] = '...o....xo.....x...'
+    board = board_from_string(''.join(rows), 19)
+
+    board.mark_dead(coord2d(4, 4, 19))
+    board.mark_dead(coord2d(16, 4, 19))
+
+    score = benchmark(count_score, board, 7.5)
+
+    assert score.black == 9*19
+    assert score.white == 10*19 + 7.5
+
+
+def test_count_scores(benchmark):
+    boards = [play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))] * 100
+    positions, dead = positions_from_boards(boards)
+
+    scores = benchmark(count_scores, positions, dead, 7.5)
+
+    assert scores[0] == count_score(boards[0], 7.5)
+
+
+def test_count_score_loop(benchmark):
+    boards = [play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))] * 100
+
+    benchmark(lambda: [count_score(board, 7.5) for board in boards])
+
+
+def test_estimate_score(benchmark):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+
+    score = benchmark.pedantic(estimate_score, (board, 7.5), setup=scoring._estimates.clear, rounds=1000)
+
+    assert len(score.points) == 361
@@ -0,0 +1,66 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+from datetime import datetime
+
+from weiqi.board import IllegalMoveError
+from weiqi.models import Game
+from weiqi.sgf import parse_sgf, game_to_sgf, game_from_sgf
+from weiqi.test.fixtures import GAME_194_MOVES, game_moves, play_moves
+
+
+def test_parse_sgf(benchmark):
+    sgf = game_to_sgf(large_game())
+
+    node = benchmark(parse_sgf, sgf)
+
+    assert node.children
+
+
+def test_game_to_sgf(benchmark):
+    game = large_game()
+
+    sgf = benchmark(game_to_sgf, game)
+
+    assert sgf.count(';') == len(game.board.tree) + 1
+
+
+def test_game_from_sgf(benchmark):
+    sgf = game_to_sgf(large_game())
+
+    game = benchmark(game_from_sgf, sgf)
+
+    assert len(game.board.tree) == sgf.count(';') - 1
+
+
+def large_game():
+    """Returns the 194 move game with a variation of up to 30 random moves at every fifth node."""
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    rnd = random.Random(0)
+
+    for node_id in range(0, 194, 5):
+        board.current_node_id = node_id
+
+        for _ in range(30):
+            try:
+                board.play(rnd.randrange(board.length))
+            except IllegalMoveError:
+                pass
+
+    board.current_node_id = 193
+
+    return Game(board=board, created_at=datetime(2016, 1, 1), black_display='black', white_display='white', komi=7.5)
@@ -23,7 +23,8 @@ from weiqi.handler.socket import SocketMixin
 from weiqi.mailer import console_mails
 from weiqi.message.broker import DummyBroker
 from weiqi.message.pubsub import PubSub
-from weiqi.models import User, Room, RoomMessage, RoomUser, DirectRoom, Connection, Automatch, Game, Timing, Challenge
+from weiqi.models import (User, Room, RoomMessage, RoomUser, DirectRoom, Connection, Automatch, Game, GameNode,
+                          GameArchive, Timing, Challenge)
 from weiqi.test import session
 
 
@@ -50,6 +51,8 @@ def db(request):
     session.query(DirectRoom).delete()
     session.query(Automatch).delete()
     session.query(Timing).delete()
+    session.query(GameNode).delete()
+    session.query(GameArchive).delete()
     session.query(Game).delete()
     session.query(Room).delete()
     session.query(Challenge).delete()
@@ -14,6 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
+
+from weiqi.board import Board
 from weiqi.sgf import game_to_sgf
 from weiqi.test.base import BaseAsyncHTTPTestCase
 from weiqi.test.factories import GameFactory
@@ -27,3 +30,30 @@ class TestSgf(BaseAsyncHTTPTestCase):
         self.assertEqual(res.code, 200)
 
         assert res.body.decode() == game_to_sgf(game)
+
+
+class TestPosition(BaseAsyncHTTPTestCase):
+    def test_position(self):
+        board = Board(9)
+        board.play(40)
+        board.play(41)
+        game = GameFactory(board=board)
+
+        res = self.fetch('/api/games/%s/positions/0' % game.id)
+        self.assertEqual(res.code, 200)
+
+        data = json.loads(res.body.decode())
+        assert data['node_id'] == 0
+        assert data['pos'] == '.'*40 + 'x' + '.'*40
+
+    def test_position_invalid_node(self):
+        game = GameFactory()
+
+        res = self.fetch('/api/games/%s/positions/1000' % game.id)
+        self.assertEqual(res.code, 404)
+
+    def test_position_private(self):
+        game = GameFactory(is_private=True)
+
+        res = self.fetch('/api/games/%s/positions/0' % game.id)
+        self.assertEqual(res.code, 403)
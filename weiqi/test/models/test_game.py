@@ -36,6 +36,50 @@ def test_winner_loser():
         assert game.winner_loser == t[1]
 
 
+def test_append_board_nodes(db):
+    game = GameFactory()
+    game.board.play(30)
+    game.append_board_nodes()
+    game.board.play(31)
+    game.append_board_nodes()
+    db.commit()
+    db.expire(game)
+
+    assert [node.node_id for node in game.board_nodes] == [0, 1]
+    assert len(game.board_data.tree) == 0
+    assert game.board.current_node_id == 1
+    assert game.board.at(31) == 'o'
+
+
+def test_apply_board_change_merges_nodes(db):
+    game = GameFactory()
+    game.board.play(30)
+    game.append_board_nodes()
+    db.commit()
+    game.board.play(31)
+    game.apply_board_change()
+    db.commit()
+    db.expire(game)
+
+    assert game.board_nodes == []
+    assert len(game.board.tree) == 2
+
+
+def test_board_lazy(db):
+    game = GameFactory()
+    game.board.play(30)
+    game.append_board_nodes()
+    db.commit()
+    db.expire(game)
+
+    assert game.current_user == game.white_user
+    assert game.board.moves_played == 1
+    assert not game.board.is_loaded
+
+    assert game.board.at(30) == 'x'
+    assert game.board.is_loaded
+
+
 def test_active_games(db):
     g1 = GameFactory(stage='playing')
     g2 = GameFactory(stage='playing')
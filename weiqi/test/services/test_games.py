@@ -18,11 +18,15 @@ from datetime import datetime, timedelta
 
 import pytest
 from weiqi import settings
-from weiqi.board import BLACK, WHITE, EMPTY, PASS, RESIGN, SYMBOL_TRIANGLE
+from weiqi.board import (BLACK, WHITE, EMPTY, PASS, RESIGN, SYMBOL_TRIANGLE, Board, board_from_string,
+                         coord2d)
 from weiqi.models import Timing
+from weiqi.scoring import count_score
 from weiqi.services import GameService, ServiceError
 from weiqi.services.games import InvalidPlayerError, InvalidStageError, GameHasNotStartedError, NotAllowedError
+from weiqi.sgf import parse_sgf
 from weiqi.test.factories import GameFactory, DemoGameFactory, UserFactory
+from weiqi.test.fixtures import GAME_194_MOVES, game_moves, play_moves
 
 
 def test_open(db, socket):
@@ -146,6 +150,20 @@ def test_move(db, socket):
     assert game.board.current == WHITE
 
 
+def test_move_appends_node(db, socket):
+    game = GameFactory()
+    svc = GameService(db, socket, game.black_user)
+
+    svc.execute('move', {'game_id': game.id, 'move': 30})
+    svc.user = game.white_user
+    svc.execute('move', {'game_id': game.id, 'move': 31})
+    db.expire(game)
+
+    assert len(game.board_data.tree) == 0
+    assert [node.node_id for node in game.board_nodes] == [0, 1]
+    assert game.board.at(31) == WHITE
+
+
 def test_move_current_color(db, socket):
     game = GameFactory()
     svc = GameService(db, socket, game.white_user)
@@ -254,6 +272,31 @@ def test_stages_playing_counting(db, socket):
     assert game.stage == 'counting'
 
 
+def test_counting_marks_dead(db, socket):
+    game = GameFactory(board=board_from_string(
+        '.....ox..'
+        '..x..ox..'
+        '.....ox..'
+        '.....ox..'
+        '.....ox.o'
+        '.....ox..'
+        '.....ox..'
+        '..o..ox..'
+        '.....ox..'))
+    svc = GameService(db, socket, game.current_user)
+
+    svc.execute('move', {'game_id': game.id, 'move': PASS})
+    svc.user = game.current_user
+    svc.execute('move', {'game_id': game.id, 'move': PASS})
+
+    assert game.stage == 'counting'
+    assert game.board_nodes == []
+    assert game.board.is_marked_dead(coord2d(3, 2))
+    assert game.board.is_marked_dead(coord2d(9, 5))
+    assert not game.board.is_marked_dead(coord2d(3, 8))
+    assert game.result == count_score(game.board, game.komi).result
+
+
 def test_resume_from_counting(db, socket):
     game = GameFactory(stage='counting')
     game.board.play(PASS)
@@ -315,6 +358,83 @@ def test_toggle_marked_dead(db, socket):
     assert svc.socket.sent_messages[0]['method'] == 'game_update'
 
 
+def test_toggle_marked_dead_rescore(db, socket, board):
+    game = GameFactory(stage='playing', komi=7.5, board=board)
+    svc = GameService(db, socket, game.black_user)
+    svc.execute('move', {'game_id': game.id, 'move': PASS})
+    svc.user = game.white_user
+    svc.execute('move', {'game_id': game.id, 'move': PASS})
+    assert game.stage == 'counting'
+
+    for coord in [0, 9, 0]:
+        svc.execute('toggle_marked_dead', {'game_id': game.id, 'coord': coord})
+        score = count_score(game.board, game.komi)
+
+        assert game.result == score.result
+        assert game.board.current_node.to_dict(game.board.length)['score_points'] == score.points
+
+
+def test_estimate(db, socket, board):
+    game = GameFactory(komi=7.5, board=board)
+    svc = GameService(db, socket, UserFactory())
+
+    data = svc.execute('estimate', {'game_id': game.id})
+
+    assert data['game_id'] == game.id
+    assert data['node_id'] == game.board.current_node_id
+    assert len(data['points']) == game.board.length
+    assert data['white'] == data['points'].count(WHITE) + 7.5
+    assert data['black'] == data['points'].count(BLACK)
+
+
+def test_estimate_private(db, socket):
+    game = GameFactory(is_private=True)
+    svc = GameService(db, socket, UserFactory())
+
+    with pytest.raises(NotAllowedError):
+        svc.execute('estimate', {'game_id': game.id})
+
+
+def test_position(db, socket, board):
+    game = GameFactory(board=board)
+    svc = GameService(db, socket, UserFactory())
+
+    data = svc.execute('position', {'game_id': game.id, 'node_id': 2})
+
+    assert data['node_id'] == 2
+    assert data['pos'] == 'xox' + '.'*78
+    assert data['current'] == WHITE
+    assert data['captures'] == []
+    assert data['ko'] is None
+    assert game.board.current_node_id == len(board.tree) - 1
+
+
+def test_position_cached(db, socket, board):
+    game = GameFactory(board=board)
+    svc = GameService(db, socket, UserFactory())
+
+    data = svc.execute('position', {'game_id': game.id, 'node_id': 2})
+    game.board = Board(9)
+
+    assert svc.execute('position', {'game_id': game.id, 'node_id': 2}) == data
+
+
+def test_position_invalid_node(db, socket, board):
+    game = GameFactory(board=board)
+    svc = GameService(db, socket, UserFactory())
+
+    with pytest.raises(ServiceError):
+        svc.execute('position', {'game_id': game.id, 'node_id': len(board.tree)})
+
+
+def test_position_private(db, socket):
+    game = GameFactory(is_private=True)
+    svc = GameService(db, socket, UserFactory())
+
+    with pytest.raises(NotAllowedError):
+        svc.execute('position', {'game_id': game.id, 'node_id': 0})
+
+
 def test_toggle_marked_dead_playing(db, socket):
     game = GameFactory(stage='playing')
     svc = GameService(db, socket, game.black_user)
@@ -587,3 +707,37 @@ def test_resume_all_games_cap(db):
     timing = db.query(Timing).first()
     assert timing.black_main == timing.main_cap
     assert timing.white_main == timing.main_cap
+
+
+def test_archive_games(db, socket):
+    board = play_moves(game_moves(parse_sgf(GAME_194_MOVES).children[0]))
+    old = datetime.utcnow() - settings.ARCHIVE_GAMES_AFTER - timedelta(minutes=1)
+    game = GameFactory(stage='finished', result='B+R', board=board, updated_at=old)
+    GameFactory(stage='finished', result='B+R', board=board.fork())
+    GameFactory(stage='playing', updated_at=old)
+    DemoGameFactory(updated_at=old)
+    db.commit()
+
+    svc = GameService(db, socket)
+    count, saved = svc.archive_games()
+    db.commit()
+    db.expire_all()
+
+    assert count == 1
+    assert saved > 0
+    assert game.board_data is None
+    assert game.board.to_dict() == board.to_dict()
+    assert svc.archive_games() == (0, 0)
+
+
+def test_archive_games_batch_size(db, socket, monkeypatch):
+    monkeypatch.setattr(settings, 'ARCHIVE_GAMES_BATCH_SIZE', 2)
+    old = datetime.utcnow() - settings.ARCHIVE_GAMES_AFTER - timedelta(minutes=1)
+
+    for _ in range(3):
+        GameFactory(stage='finished', result='B+R', updated_at=old)
+
+    svc = GameService(db, socket)
+
+    assert svc.archive_games()[0] == 2
+    assert svc.archive_games()[0] == 1
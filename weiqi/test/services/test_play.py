@@ -20,7 +20,8 @@ import pytest
 from weiqi import settings
 from weiqi.models import Automatch, Game, Challenge
 from weiqi.services import PlayService
-from weiqi.services.play import ChallengeExpiredError, InvalidBoardSizeError, ChallengePrivateCannotBeRankedError
+from weiqi.services.play import (ChallengeExpiredError, InvalidBoardSizeError, ChallengePrivateCannotBeRankedError,
+                                 InvalidSuperkoError)
 from weiqi.test.factories import UserFactory, AutomatchFactory, GameFactory, ChallengeFactory
 
 
@@ -153,6 +154,24 @@ def test_automatch_preset(db, socket):
     assert db.query(Game).count() == 1
 
 
+def test_automatch_superko(db, socket):
+    user = UserFactory(rating=1500)
+    other = UserFactory(rating=1500)
+    third = UserFactory(rating=1500)
+    AutomatchFactory(user=user, user_rating=1500, user__rating=1500, min_rating=1500, max_rating=1500, preset='fast')
+
+    svc = PlayService(db, socket, other)
+    svc.execute('automatch', {'preset': 'fast', 'max_hc': 1, 'superko': True})
+    assert db.query(Automatch).count() == 2
+    assert db.query(Game).count() == 0
+
+    svc = PlayService(db, socket, third)
+    svc.execute('automatch', {'preset': 'fast', 'max_hc': 1, 'superko': True})
+    assert db.query(Automatch).count() == 1
+    assert not db.query(Automatch).first().superko
+    assert db.query(Game).first().board.superko
+
+
 def test_automatch_correspondence(db, socket, mails):
     user = UserFactory(rating=1500, is_online=False)
     other = UserFactory(rating=1500, is_online=False)
@@ -428,6 +447,60 @@ def test_accept_private_challenge(db, socket):
     assert game.is_private
 
 
+def test_challenge_superko(db, socket):
+    user = UserFactory(rating=1500)
+    other = UserFactory(rating=1500)
+
+    svc = PlayService(db, socket, user)
+
+    svc.execute('challenge', {
+        'user_id': other.id,
+        'size': 19,
+        'handicap': 0,
+        'komi': 7.5,
+        'owner_is_black': True,
+        'speed': 'live',
+        'timing': 'fischer',
+        'maintime': 10,
+        'overtime': 20,
+        'overtime_count': 1,
+        'superko': True
+    })
+
+    challenge = db.query(Challenge).first()
+    assert challenge.superko
+
+    svc = PlayService(db, socket, other)
+    svc.execute('accept_challenge', {'challenge_id': challenge.id})
+
+    game = db.query(Game).first()
+    assert game.board.superko
+
+
+def test_challenge_invalid_superko(db, socket):
+    user = UserFactory(rating=1500)
+    other = UserFactory(rating=1500)
+
+    svc = PlayService(db, socket, user)
+
+    with pytest.raises(InvalidSuperkoError):
+        svc.execute('challenge', {
+            'user_id': other.id,
+            'size': 19,
+            'handicap': 0,
+            'komi': 7.5,
+            'owner_is_black': True,
+            'speed': 'live',
+            'timing': 'fischer',
+            'maintime': 10,
+            'overtime': 20,
+            'overtime_count': 1,
+            'superko': 'yes'
+        })
+
+    assert db.query(Challenge).count() == 0
+
+
 def test_challenge_private_ranked(db, socket):
     user = UserFactory(rating=1500)
     other = UserFactory(rating=1500)
@@ -14,7 +14,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from weiqi.services import SearchService
+import pytest
+from weiqi import settings
+from weiqi.board import Board
+from weiqi.position_index import position_index, pattern_index
+from weiqi.services import SearchService, ServiceError
 from weiqi.test.factories import UserFactory, GameFactory
 
 
@@ -79,3 +83,71 @@ def test_games_display_names(db, socket):
     assert data['results'][0]['id'] == demo.id
     assert data['results'][1]['id'] == white.id
     assert data['results'][2]['id'] == black.id
+
+
+def test_position(db, socket, tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'POSITION_INDEX_PATH', str(tmpdir.join('positions.idx')))
+    board = Board(9)
+    board.play(40)
+    board.play(30)
+    game = GameFactory(stage='finished', result='B+R', board=board)
+    GameFactory(stage='finished', result='B+R')
+    position_index().add_game(game)
+
+    svc = SearchService(db, socket)
+    data = svc.execute('position', {'size': 9, 'pos': '.'*40 + 'x' + '.'*40})
+
+    assert data['total_results'] == 1
+    assert data['results'][0]['id'] == game.id
+    assert data['results'][0]['node_id'] == 0
+
+    data = svc.execute('position', {'size': 9, 'pos': '.'*40 + 'x' + '.'*9 + 'o' + '.'*30})
+
+    assert data['total_results'] == 1
+    assert data['results'][0]['node_id'] == 1
+
+
+def test_position_invalid(db, socket):
+    svc = SearchService(db, socket)
+
+    with pytest.raises(ServiceError):
+        svc.execute('position', {'size': 9, 'pos': '...'})
+
+    with pytest.raises(ServiceError):
+        svc.execute('position', {'size': 9, 'pos': ['.']*81})
+
+
+def test_position_invalid_size(db, socket):
+    svc = SearchService(db, socket)
+
+    with pytest.raises(ServiceError):
+        svc.execute('position', {'size': 3, 'pos': '.'*9})
+
+
+def test_pattern(db, socket, tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'PATTERN_INDEX_PATH', str(tmpdir.join('patterns.idx')))
+    board = Board(9)
+    board.play(60)
+    board.play(70)
+    game = GameFactory(stage='finished', result='B+R', board=board)
+    pattern_index().add_game(game)
+
+    svc = SearchService(db, socket)
+    data = svc.execute('pattern', {'size': 9, 'kind': 'corner', 'pattern': '.'*16 + 'o' + '.'*32})
+
+    assert data['total_results'] == 1
+    assert data['results'][0]['id'] == game.id
+    assert data['results'][0]['node_id'] == 0
+
+
+def test_pattern_invalid(db, socket):
+    svc = SearchService(db, socket)
+
+    with pytest.raises(ServiceError):
+        svc.execute('pattern', {'size': 9, 'kind': 'center', 'pattern': '.'*49})
+
+    with pytest.raises(ServiceError):
+        svc.execute('pattern', {'size': 9, 'kind': 'corner', 'pattern': '.'*48})
+
+    with pytest.raises(ServiceError):
+        svc.execute('pattern', {'size': 9, 'kind': 'corner', 'pattern': ['.']*49})
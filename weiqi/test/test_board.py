@@ -17,7 +17,7 @@
 import pytest
 from weiqi.board import (Board, Node, coord2d, coord_to_2d, BLACK, WHITE, EMPTY, NODE_BLACK, NODE_WHITE,
                          board_from_string, IllegalMoveError, PASS, RESIGN, board_from_dict, neighbors, coord_from_sgf,
-                         coord_to_sgf)
+                         coord_to_sgf, neighbor_table, flood_fill, node_from_dict, CODE_BLACK, CODE_WHITE, CODE_EMPTY)
 
 
 def test_coord_to_2d():
@@ -50,6 +50,73 @@ def test_neighbors():
                                                 coord2d(4, 5), coord2d(6, 5)}
 
 
+def test_neighbor_table():
+    for size in [9, 13, 19]:
+        table = neighbor_table(size)
+
+        assert len(table) == size*size
+        assert table is neighbor_table(size)
+        assert set(table[coord2d(1, 1, size)]) == {coord2d(2, 1, size), coord2d(1, 2, size)}
+        assert set(table[coord2d(size, size, size)]) == {coord2d(size, size-1, size), coord2d(size-1, size, size)}
+
+
+def test_flood_fill():
+    board = board_from_string(
+        '.........'
+        '.........'
+        '..ooo....'
+        '..oxo....'
+        '..oxo....'
+        '..xxx....'
+        '.........'
+        '.........'
+        '.........')
+
+    region, border = flood_fill(board.pos_array, 9, coord2d(4, 4), (CODE_BLACK,))
+    assert region == {coord2d(4, 4), coord2d(4, 5), coord2d(3, 6), coord2d(4, 6), coord2d(5, 6)}
+    assert coord2d(4, 3) in border
+    assert coord2d(4, 7) in border
+
+    assert flood_fill(board.pos_array, 9, coord2d(4, 4), (CODE_BLACK,), (CODE_WHITE,)) is None
+
+    region, border = flood_fill(bytearray([CODE_EMPTY])*361, 19, 0, (CODE_EMPTY,))
+    assert len(region) == 361
+    assert not border
+
+
+def test_pos():
+    board = Board(9)
+    board.play(coord2d(3, 3))
+
+    assert len(board.pos) == 81
+    assert board.pos[coord2d(3, 3)] == BLACK
+    assert board.pos.count(EMPTY) == 80
+
+
+def test_node_dict():
+    data = {'id': 2, 'parent_id': 1, 'children': [], 'action': 'B', 'move': 9, 'captures': [0]}
+
+    node = node_from_dict(data)
+    assert node.captures == [0]
+    assert not node.marked_dead
+    assert node.to_dict() == data
+
+
+def test_node_dict_bitsets():
+    data = {'id': 0, 'parent_id': None, 'children': [], 'action': 'B', 'move': 3,
+            'marked_dead': {'3': True, '7': True}, 'score_points': ['x', '.', 'o', 'x']}
+
+    node = node_from_dict(data)
+    assert node.marked_dead == 0b10001000
+    assert node.score_points == (0b1001, 0b100)
+    assert node.to_dict(4) == data
+
+    compact = node.to_dict(4, compact=True)
+    assert compact['marked_dead'] == 0b10001000
+    assert compact['score_points'] == [0b1001, 0b100]
+    assert node_from_dict(compact).to_dict(4) == data
+
+
 def test_toggle_symbol():
     node = Node()
 
@@ -127,6 +194,23 @@ def test_board_from_dict():
     assert from_dict.handicap == 1
 
 
+def test_current_edits_handicap():
+    board = Board(9)
+    board.place_handicap(2)
+    assert board.current == WHITE
+
+    board.play(40)
+    board.toggle_edit(10, WHITE)
+    board.toggle_edit(11, WHITE)
+    assert board.current == BLACK
+
+    from_dict = board_from_dict(board.to_dict())
+    assert from_dict.current == BLACK
+
+    from_dict.current_node_id = 0
+    assert from_dict.current == WHITE
+
+
 def test_play():
     board = Board()
 
@@ -224,6 +308,89 @@ def test_ko_rule():
         board.play(coord2d(4, 4))
 
 
+def test_legal_moves():
+    board = board_from_string(
+        '.x.......'
+        'x.xo.....'
+        '.x.xo....'
+        '..xo.....'
+        '.........'
+        '.........'
+        '.........'
+        '.........'
+        '.........')
+
+    legal = board.legal_moves(WHITE)
+    assert not legal[coord2d(1, 1)]
+    assert not legal[coord2d(2, 2)]
+    assert legal[coord2d(3, 3)]
+    assert board.legal_moves(BLACK)[coord2d(1, 1)]
+
+    board.current = WHITE
+    board.play(coord2d(3, 3))
+    assert board.at(coord2d(4, 3)) == EMPTY
+
+    legal = board.legal_moves()
+    assert not legal[coord2d(4, 3)]
+
+    for coord in range(board.length):
+        try:
+            board.play(coord)
+        except IllegalMoveError:
+            assert not legal[coord]
+            continue
+
+        assert legal[coord]
+        board.current_node_id = board.current_node.parent_id
+
+
+def test_superko():
+    pos = ('.........'
+           '.........'
+           '...o.....'
+           '..oxo....'
+           '..x.x....'
+           '...x.....'
+           '.........'
+           '.........'
+           '.........')
+
+    for superko in [False, True]:
+        board = board_from_string(pos)
+        board.superko = superko
+
+        board.current = WHITE
+        board.play(coord2d(4, 5))
+        board.play(PASS)
+        board.play(PASS)
+
+        if superko:
+            with pytest.raises(IllegalMoveError):
+                board.play(coord2d(4, 4))
+        else:
+            board.play(coord2d(4, 4))
+            assert board.at(coord2d(4, 5)) == EMPTY
+
+
+def test_position_hash():
+    board = Board(9)
+    empty_hash = board.position_hash
+
+    board.play(coord2d(3, 3))
+    board.play(coord2d(5, 5))
+    assert board.position_hash != empty_hash
+
+    other = Board(9)
+    other.add_edits([coord2d(3, 3)], [coord2d(5, 5)], [])
+    assert other.position_hash == board.position_hash
+
+    board.current_node_id = 0
+    assert board.position_hash != other.position_hash
+
+    from_dict = board_from_dict(board.to_dict())
+    assert from_dict.position_hash == board.position_hash
+
+
 def test_snapback_not_ko():
     board = board_from_string(
         '.........'
@@ -316,6 +483,34 @@ def test_chain_liberties():
     assert len(board.chain_liberties(board.chain_at(coord2d(5, 4)))) == 4
 
 
+def test_chain_liberties_after_play():
+    board = board_from_string(
+        '.........'
+        '...xxx...'
+        '....oox..'
+        '..xoox...'
+        '..xox....'
+        '...x.....'
+        '.........'
+        '.........'
+        '.........')
+
+    board.current = BLACK
+    board.play(coord2d(4, 3))
+    board.play(coord2d(5, 3))
+    board.play(coord2d(4, 4))
+
+    for coord in range(board.length):
+        if board.at(coord) == EMPTY:
+            continue
+
+        chain = board.chain_at(coord)
+        tracked = board._chain_map()[coord]
+
+        assert tracked.stones == chain
+        assert tracked.liberties == board.chain_liberties(chain)
+
+
 def test_suicide():
     board = board_from_string(
         '.x.......'
@@ -424,6 +619,112 @@ def test_rebuild_pos():
     assert str(board) == str(expected)
 
 
+def test_checkpoints():
+    board = Board(9)
+
+    for i in range(70):
+        board.play(PASS)
+
+    assert list(board._checkpoints) == [Board.CHECKPOINT_INTERVAL, Board.CHECKPOINT_INTERVAL*2]
+    assert 'checkpoint' not in board.tree[Board.CHECKPOINT_INTERVAL].to_dict()
+
+
+def test_checkpoints_fork(monkeypatch):
+    monkeypatch.setattr(Board, 'MAX_CHECKPOINTS', 1)
+    board = Board(9)
+
+    for coord in range(40):
+        board.play(coord)
+
+    fork = board.fork()
+
+    for coord in range(40, 70):
+        fork.play(coord)
+
+    assert list(board._checkpoints) == [Board.CHECKPOINT_INTERVAL]
+    assert list(fork._checkpoints) == [Board.CHECKPOINT_INTERVAL*2]
+
+    board.current_node_id = Board.CHECKPOINT_INTERVAL + 1
+    expected = str(board)
+    board._rebuild_pos()
+    assert str(board) == expected
+
+
+def test_rebuild_pos_checkpoint():
+    board = Board(9)
+
+    for coord in range(70):
+        board.play(coord)
+
+    for node_id in [0, 31, 32, 33, 64, 69]:
+        board.current_node_id = node_id
+        expected = str(board)
+
+        board._rebuild_pos(from_root=True)
+        assert str(board) == expected
+
+
+def test_navigate_variations():
+    board = Board(9)
+
+    for coord in [1, 0, 9, 40, 0]:
+        board.play(coord)
+
+    assert board.tree[2].captures == [0]
+
+    board.current_node_id = 1
+    board.play(10)
+    board.play(9)
+
+    for node_id in [2, 4, 6, 1, 3, 0, 5, 4, 6]:
+        board.current_node_id = node_id
+        expected_hash = board.position_hash
+        expected = str(board)
+
+        board._rebuild_pos(from_root=True)
+        assert str(board) == expected
+        assert board.position_hash == expected_hash
+
+
+def test_navigate_forward_captures():
+    board = Board(9)
+    board.play(1)
+    board.play(0)
+
+    board.current_node_id = 0
+    board.legal_moves()
+    board.current_node_id = 1
+    board.play(9)
+
+    assert board.at(0) == EMPTY
+    assert board.current_node.captures == [0]
+
+
+def test_fork():
+    board = Board(9)
+
+    for coord in range(20):
+        board.play(coord)
+
+    fork = board.fork()
+    assert fork.tree[5] is board.tree[5]
+
+    fork.current_node_id = 5
+    fork.play(40)
+    fork.toggle_marked_dead(0)
+
+    assert fork.tree[5] is not board.tree[5]
+    assert board.tree[5].children == [6]
+    assert fork.tree[5].children == [6, 20]
+    assert fork.tree[20].marked_dead
+    assert str(board) == str(board_from_dict(board.to_dict()))
+
+    board.toggle_edit(40, WHITE)
+    assert board.at(40) == WHITE
+    assert fork.at(40) == BLACK
+    assert fork.tree[10] is board.tree[10]
+
+
 def test_mark_dead():
     board = board_from_string(
         '..xo.....'
@@ -0,0 +1,87 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from datetime import datetime
+
+import pytest
+from weiqi import codec
+from weiqi.glicko2 import Player, Result, player_from_dict, WIN
+
+CODECS = codec.available_codecs()
+
+
+@pytest.fixture(params=[c[1] for c in CODECS], ids=[c[0] for c in CODECS])
+def dumps_loads(request):
+    return request.param
+
+
+def test_fallback_available():
+    assert CODECS[-1][0] == 'json'
+    assert codec.NAME == CODECS[0][0]
+
+
+def test_round_trip(dumps_loads):
+    dumps, loads = dumps_loads
+    data = {'method': 'game_update', 'data': {'id': 1, 'node': {'move': 30, 'captures': [31, 32]}, 'komi': 7.5,
+                                              'title': '围棋', 'is_demo': False, 'rating': None}}
+
+    assert loads(dumps(data)) == data
+    assert loads(dumps(data).encode()) == data
+
+
+def test_compact(dumps_loads):
+    dumps, loads = dumps_loads
+
+    assert dumps({'a': [1, 2], 'b': 'ü'}) == '{"a":[1,2],"b":"ü"}'
+
+
+def test_datetime(dumps_loads):
+    dumps, loads = dumps_loads
+    date = datetime(2016, 7, 1, 12, 30, 15, 120)
+
+    assert loads(dumps({'created_at': date})) == {'created_at': date.isoformat()}
+
+
+def test_int_keys(dumps_loads):
+    dumps, loads = dumps_loads
+
+    assert loads(dumps({1: 'a'})) == {'1': 'a'}
+
+
+def test_rating(dumps_loads):
+    dumps, loads = dumps_loads
+    player = Player(1600, 120, 0.05)
+    player.add_result(Result(WIN, 1500, 100, 0.06))
+    data = loads(dumps(player))
+
+    assert player.almost_equals(player_from_dict(data))
+    assert data['results'] == [{'result': WIN, 'rating': 1500, 'deviation': 100, 'volatility': 0.06}]
+
+
+def test_unserializable(dumps_loads):
+    dumps, loads = dumps_loads
+
+    with pytest.raises(TypeError):
+        dumps({'a': {1, 2}})
+
+    with pytest.raises(TypeError):
+        dumps({'a': Point(1, 2)})
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
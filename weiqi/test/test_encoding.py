@@ -0,0 +1,125 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+import pytest
+from weiqi.board import Board, PASS, BLACK, WHITE, SYMBOL_CIRCLE, points_to_bits
+from weiqi.encoding import encode_board, decode_board, encode_node, append_node
+from weiqi.scoring import count_score
+
+
+def test_round_trip(board):
+    data = encode_board(board)
+
+    assert len(data) < len(json.dumps(board.to_dict(compact=True))) / 5
+    assert decode_board(data).to_dict(compact=True) == board.to_dict(compact=True)
+
+
+def test_round_trip_nodes():
+    board = Board(19, handicap=2)
+    board.superko = True
+    board.play(PASS)
+    board.play(300)
+    board.toggle_edit(40, 'o')
+    board.current_node.toggle_label(41)
+    board.current_node.toggle_symbol(42, SYMBOL_CIRCLE)
+    board.current_node_id = 1
+    board.play(301)
+    board.mark_dead(300)
+    board.current_node.score_points = points_to_bits(count_score(board, 0.5).points)
+
+    decoded = decode_board(encode_board(board))
+
+    assert decoded.to_dict(compact=True) == board.to_dict(compact=True)
+    assert str(decoded) == str(board)
+
+
+def test_explicit_children(board):
+    board.current_node_id = 2
+    board.play(50)
+    board.tree[2].children.reverse()
+
+    assert decode_board(encode_board(board)).tree[2].children == board.tree[2].children
+
+
+def test_append_node(board):
+    decoded = decode_board(encode_board(board))
+    board.play(PASS)
+    board.play(50)
+
+    append_node(decoded, encode_node(board.tree[-2]))
+    append_node(decoded, encode_node(board.tree[-1]))
+
+    assert decoded.to_dict(compact=True) == board.to_dict(compact=True)
+    assert str(decoded) == str(board)
+
+
+def test_lazy_decode(board):
+    decoded = decode_board(encode_board(board))
+
+    assert decoded.current == board.current
+    assert decoded.moves_played == board.moves_played
+    assert decoded.current_node_id == board.current_node_id
+    assert not decoded.is_loaded
+
+    assert decoded.to_dict(compact=True) == board.to_dict(compact=True)
+    assert decoded.is_loaded
+
+
+def test_lazy_append_node(board):
+    decoded = decode_board(encode_board(board))
+    board.play(50)
+    append_node(decoded, encode_node(board.current_node))
+
+    assert decoded.current == WHITE
+    assert decoded.moves_played == board.moves_played
+    assert not decoded.is_loaded
+
+    board.add_edits([51], [], [])
+    append_node(decoded, encode_node(board.current_node))
+
+    assert decoded.current == WHITE
+    assert not decoded.is_loaded
+    assert decoded.to_dict(compact=True) == board.to_dict(compact=True)
+
+
+def test_lazy_current_node_changed(board):
+    decoded = decode_board(encode_board(board))
+    decoded.current_node_id = 0
+
+    assert decoded.current == WHITE
+    assert decoded.is_loaded
+
+
+def test_version_1(board):
+    data = encode_board(board)
+    decoded = decode_board(b'\x01' + data[1:5] + data[6:])
+
+    assert decoded.current == BLACK
+    assert decoded.to_dict(compact=True) == board.to_dict(compact=True)
+
+
+def test_legacy_json(board):
+    data = json.dumps(board.to_dict(compact=True))
+
+    assert decode_board(data).to_dict(compact=True) == board.to_dict(compact=True)
+    assert decode_board(data.encode()).to_dict(compact=True) == board.to_dict(compact=True)
+
+
+def test_unknown_version(board):
+    with pytest.raises(ValueError):
+        decode_board(b'\x7f' + encode_board(board)[1:])
@@ -0,0 +1,143 @@
+# weiqi.gs
+# Copyright (C) 2016 Michael Bitzi
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from weiqi import settings
+from weiqi.board import Board, board_from_string
+from weiqi.position_index import (position_key, pattern_key, pattern_keys, game_postings, PositionIndex, position_index,
+                                  pattern_index, index_game, wait_for_background_tasks, _locked)
+from weiqi.test.factories import GameFactory
+
+
+def test_position_key_symmetric():
+    corners = [board_from_string(s) for s in ['x........' + '.'*72, '........x' + '.'*72, '.'*72 + 'x........',
+                                              '.'*72 + '........x']]
+    keys = {position_key(b.pos_array, 9) for b in corners}
+
+    assert len(keys) == 1
+    assert position_key(board_from_string('o........' + '.'*72).pos_array, 9) not in keys
+    assert position_key(Board(9).pos_array, 9) == 0
+
+
+def test_game_postings(board):
+    board.current_node_id = 3
+    postings = game_postings(5, board)
+
+    assert len(postings) == len(board.tree)
+    assert list(postings['node_id']) == list(range(len(board.tree)))
+    assert set(postings['game_id']) == {5}
+    assert board.current_node_id == 3
+
+
+def test_search(db, tmpdir, board):
+    index = PositionIndex(os.path.join(str(tmpdir), 'positions.idx'))
+    game = GameFactory(stage='finished', result='B+R', board=board)
+    board.current_node_id = 4
+    key = position_key(board.pos_array, board.size)
+
+    index.write([game_postings(game.id + 1, board)])
+    index.add_game(game)
+
+    assert [tuple(p) for p in index.search(key)] == [(key, game.id, 4), (key, game.id + 1, 4)]
+
+    index.compact()
+
+    assert not os.path.exists(index.new_path)
+    assert len(index) == 2*len(board.tree)
+    assert [tuple(p) for p in index.search(key)] == [(key, game.id, 4), (key, game.id + 1, 4)]
+
+
+def test_write_keeps_appended(tmpdir, board):
+    index = PositionIndex(os.path.join(str(tmpdir), 'positions.idx'))
+    postings = [game_postings(game_id, board) for game_id in range(1, 4)]
+    index.add(postings[0])
+
+    def chunks():
+        index.add(postings[1])
+        yield postings[2]
+
+    index.write(chunks())
+
+    assert not os.path.exists(index.merging_path)
+    assert set(index.search(postings[0]['key'][1])['game_id']) == {2, 3}
+
+
+def test_compact_min_postings(tmpdir, board):
+    index = PositionIndex(os.path.join(str(tmpdir), 'positions.idx'))
+    index.add(game_postings(1, board))
+
+    assert not index.compact(len(board.tree) + 1)
+    assert os.path.exists(index.new_path)
+
+    with _locked(index.write_lock_path):
+        assert not index.compact()
+
+    assert index.compact(len(board.tree))
+    assert not os.path.exists(index.new_path)
+    assert len(index) == len(board.tree)
+
+
+def test_index_game_after_commit(db, tmpdir, monkeypatch, board):
+    monkeypatch.setattr(settings, 'POSITION_INDEX_PATH', str(tmpdir.join('positions.idx')))
+    monkeypatch.setattr(settings, 'PATTERN_INDEX_PATH', str(tmpdir.join('patterns.idx')))
+    key = position_key(board.pos_array, board.size)
+    game = GameFactory(stage='finished', result='B+R', board=board)
+
+    index_game(db, game)
+    db.rollback()
+    wait_for_background_tasks()
+
+    assert len(position_index().search(key)) == 0
+
+    index_game(db, game)
+    wait_for_background_tasks()
+
+    assert len(position_index().search(key)) == 0
+
+    db.commit()
+    wait_for_background_tasks()
+
+    assert list(position_index().search(key)['game_id']) == [game.id]
+    assert len(pattern_index()) == len(pattern_index().postings(game.id, board))
+
+
+def test_add_game_unfinished(db, tmpdir, board):
+    index = PositionIndex(os.path.join(str(tmpdir), 'positions.idx'))
+    index.add_game(GameFactory(stage='playing', board=board))
+    index.add_game(GameFactory(stage='finished', result='aborted', board=board))
+
+    assert len(index) == 0
+
+
+def test_pattern_keys():
+    corner = board_from_string(
+        '.........'
+        '...x.....'
+        '..o......' + '.'*54)
+    other_corner = board_from_string('.'*54 +
+        '......o..'
+        '.....x...'
+        '.........')
+    side = board_from_string(
+        '....x....' + '.'*72)
+
+    keys = pattern_keys(corner.pos_array, 9)
+
+    assert set(keys) == set(pattern_keys(other_corner.pos_array, 9))
+    assert pattern_key('corner', '.'*7 + '...x...' + '..o....' + '.'*28, 9) in keys
+    assert pattern_key('side', '....x....' + '.'*36, 9) in pattern_keys(side.pos_array, 9)
+    assert not set(keys) & set(pattern_keys(side.pos_array, 9))
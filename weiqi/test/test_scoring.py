@@ -14,8 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from weiqi.board import board_from_string, BLACK, WHITE, EMPTY, coord2d
-from weiqi.scoring import count_score, can_reach_only
+from weiqi.board import Board, board_from_string, BLACK, WHITE, EMPTY, coord2d, PASS
+from weiqi.scoring import (count_score, can_reach_only, rescore, count_scores, positions_from_boards, estimate_score,
+                           estimate_dead)
 
 
 def test_can_reach_only():
@@ -125,6 +126,28 @@ def test_marked_dead():
     assert score.win_by == 2.5
 
 
+def test_rescore():
+    board = board_from_string(
+        '.ox......'
+        '.oxxx....'
+        '.oooxxxxx'
+        'xxxoooooo'
+        '.x....oxx'
+        'xooooox..'
+        'xoooxxxx.'
+        '.oxxxooox'
+        '.ox.xo.o.')
+
+    points = count_score(board, 7.5).points
+
+    for coord in [coord2d(1, 4), coord2d(8, 9), coord2d(1, 4), coord2d(3, 1)]:
+        changed = board.toggle_marked_dead(coord)
+        score = rescore(board, 7.5, points, changed)
+
+        assert score == count_score(board, 7.5)
+        points = score.points
+
+
 def test_neutral_points():
     board = board_from_string(
         '.....x.o.'
@@ -149,3 +172,126 @@ def test_neutral_points():
     assert score.points[coord2d(5, 7)] == EMPTY
     assert score.points[coord2d(6, 7)] == EMPTY
     assert score.points[coord2d(6, 8)] == EMPTY
+
+
+def test_count_scores():
+    boards = [
+        board_from_string(
+            '.....xo..'
+            '.....xo..'
+            '.....xo..'
+            '.....xo..'
+            '.....xo..'
+            '.....xo..'
+            'xxxxxxo..'
+            'ooooooo..'
+            '.........'),
+        board_from_string(
+            '.ox......'
+            '.oxxx....'
+            '.oooxxxxx'
+            'xxxoooooo'
+            '.x....oxx'
+            'xooooox..'
+            'xoooxxxx.'
+            '.oxxxooox'
+            '.ox.xo.o.'),
+        board_from_string(
+            '.....x.o.'
+            '.....x.o.'
+            '.....x.o.'
+            '.....xo..'
+            '.....xo..'
+            '....xxo..'
+            'xxxx..o..'
+            'ooooo.o..'
+            '.....o...'),
+        board_from_string('.'*81),
+    ]
+
+    boards[0].handicap = 4
+    boards[1].mark_dead(coord2d(1, 4))
+    boards[1].mark_dead(coord2d(8, 9))
+
+    positions, dead = positions_from_boards(boards)
+    scores = count_scores(positions, dead, 7.5, [board.handicap for board in boards])
+
+    for score, board in zip(scores, boards):
+        assert score == count_score(board, 7.5)
+
+
+def test_estimate_score():
+    board = board_from_string(
+        '.........'
+        '.........'
+        '..x...o..'
+        '.........'
+        '.........'
+        '.........'
+        '..x...o..'
+        '.........'
+        '.........')
+
+    score = estimate_score(board, 6.5)
+
+    assert score.points[coord2d(2, 4)] == BLACK
+    assert score.points[coord2d(8, 4)] == WHITE
+    assert score.points[coord2d(5, 4)] == EMPTY
+    assert score.black == score.white - 6.5
+    assert estimate_score(board, 6.5) == score
+
+    board.mark_dead(coord2d(7, 3))
+    assert estimate_score(board, 6.5).points[coord2d(7, 3)] != WHITE
+
+
+def test_estimate_dead():
+    board = board_from_string(
+        '.ox......'
+        '.oxxx....'
+        '.oooxxxxx'
+        'xxxoooooo'
+        '.x....oxx'
+        'xooooox..'
+        'xoooxxxx.'
+        '.oxxxooox'
+        '.ox.xo.o.')
+
+    board.mark_dead(coord2d(1, 4))
+    board.mark_dead(coord2d(8, 9))
+    expected = {c for c in range(board.length) if board.is_marked_dead(c)}
+
+    assert estimate_dead(board) == expected
+
+
+def test_estimate_dead_alive():
+    board = board_from_string(
+        '.....ox..'
+        '..x..ox..'
+        '.....ox..'
+        '.....ox..'
+        '.....ox.o'
+        '.....ox..'
+        '.....ox..'
+        '..o..ox..'
+        '.....ox..')
+
+    assert estimate_dead(board) == {coord2d(3, 2), coord2d(9, 5)}
+
+
+def test_estimate_dead_symmetric():
+    board = Board(9)
+    board.play(20)
+    board.play(60)
+
+    assert estimate_dead(board) == set()
+
+
+def test_estimate_dead_open_space():
+    board = Board(9)
+    board.play(20)
+    board.play(60)
+    board.play(24)
+    board.play(PASS)
+    board.play(PASS)
+
+    assert estimate_dead(board) == set()